@@ -1,5 +1,5 @@
 from logging.config import fileConfig
-from models import product_model, event_model, user_model, sale_model, commissioner_event
+from models import product_model, event_model, user_model, sale_model, commissioner_event, email_outbox_model, idempotency_key_model, refresh_token_model, sales_rollup_model
 from database import Base
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
@@ -0,0 +1,66 @@
+"""Agregados de vendas por hora
+
+Revision ID: d71a4e2c9b05
+Revises: b5e13c9a7d42
+Create Date: 2026-10-18 13:05:41.220917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd71a4e2c9b05'
+down_revision: Union[str, Sequence[str], None] = 'b5e13c9a7d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sales_rollups',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('seller_key', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('paid_count', sa.Integer(), nullable=False),
+    sa.Column('canceled_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('checked_in_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id', 'product_id', 'seller_key', 'bucket')
+    )
+    op.create_index('ix_sales_rollups_event_bucket', 'sales_rollups', ['event_id', 'bucket'], unique=False)
+
+    # Backfill com as vendas existentes (mesma regra de utils.rollup_utils.rebuild_rollups)
+    op.execute("""
+        INSERT INTO sales_rollups (event_id, product_id, seller_key, bucket, paid_count, canceled_count, revenue, checked_in_count)
+        SELECT event_id, product_id, seller_key, bucket,
+               SUM(paid_count), SUM(canceled_count), SUM(revenue), SUM(checked_in_count)
+        FROM (
+            SELECT p.event_id, s.product_id, COALESCE(s.seller_id, 0) AS seller_key,
+                   date_trunc('hour', s.created_at) AS bucket,
+                   COUNT(*) FILTER (WHERE s.status = 'PAGO') AS paid_count,
+                   COUNT(*) FILTER (WHERE s.status = 'CANCELADO') AS canceled_count,
+                   COALESCE(SUM(s.sale_price) FILTER (WHERE s.status = 'PAGO'), 0) AS revenue,
+                   0 AS checked_in_count
+            FROM sales s JOIN products p ON p.id = s.product_id
+            GROUP BY 1, 2, 3, 4
+            UNION ALL
+            SELECT p.event_id, s.product_id, COALESCE(s.seller_id, 0),
+                   date_trunc('hour', s.checked_at), 0, 0, 0, COUNT(*)
+            FROM sales s JOIN products p ON p.id = s.product_id
+            WHERE s.checked_at IS NOT NULL
+            GROUP BY 1, 2, 3, 4
+        ) AS parts
+        GROUP BY event_id, product_id, seller_key, bucket
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sales_rollups_event_bucket', table_name='sales_rollups')
+    op.drop_table('sales_rollups')
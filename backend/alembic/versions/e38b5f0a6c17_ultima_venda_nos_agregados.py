@@ -0,0 +1,47 @@
+"""Última venda e último cancelamento nos agregados
+
+Revision ID: e38b5f0a6c17
+Revises: d71a4e2c9b05
+Create Date: 2026-10-18 16:42:09.518304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e38b5f0a6c17'
+down_revision: Union[str, Sequence[str], None] = 'd71a4e2c9b05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('sales_rollups', sa.Column('last_sale_at', sa.DateTime(), nullable=True))
+    op.add_column('sales_rollups', sa.Column('last_canceled_at', sa.DateTime(), nullable=True))
+
+    # Backfill com as vendas existentes (mesma regra de utils.rollup_utils.rebuild_rollups)
+    op.execute("""
+        UPDATE sales_rollups r
+        SET last_sale_at = latest.last_sale_at, last_canceled_at = latest.last_canceled_at
+        FROM (
+            SELECT p.event_id, s.product_id, COALESCE(s.seller_id, 0) AS seller_key,
+                   date_trunc('hour', s.created_at) AS bucket,
+                   MAX(s.created_at) AS last_sale_at,
+                   MAX(s.canceled_at) FILTER (WHERE s.status = 'CANCELADO') AS last_canceled_at
+            FROM sales s JOIN products p ON p.id = s.product_id
+            WHERE s.status IN ('PAGO', 'CANCELADO')
+            GROUP BY 1, 2, 3, 4
+        ) AS latest
+        WHERE r.event_id = latest.event_id AND r.product_id = latest.product_id
+          AND r.seller_key = latest.seller_key AND r.bucket = latest.bucket
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('sales_rollups', 'last_canceled_at')
+    op.drop_column('sales_rollups', 'last_sale_at')
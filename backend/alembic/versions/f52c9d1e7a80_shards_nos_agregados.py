@@ -0,0 +1,47 @@
+"""Shards nos agregados de vendas
+
+Revision ID: f52c9d1e7a80
+Revises: e38b5f0a6c17
+Create Date: 2026-10-18 18:20:37.402811
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f52c9d1e7a80'
+down_revision: Union[str, Sequence[str], None] = 'e38b5f0a6c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('sales_rollups', sa.Column('shard', sa.Integer(), nullable=False, server_default='0'))
+    op.alter_column('sales_rollups', 'shard', server_default=None)
+    op.drop_constraint('sales_rollups_pkey', 'sales_rollups', type_='primary')
+    op.create_primary_key('sales_rollups_pkey', 'sales_rollups', ['event_id', 'product_id', 'seller_key', 'bucket', 'shard'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Consolida os shards antes de voltar à chave sem shard
+    op.execute("""
+        WITH merged AS (
+            DELETE FROM sales_rollups
+            RETURNING event_id, product_id, seller_key, bucket, paid_count, canceled_count, revenue,
+                      checked_in_count, last_sale_at, last_canceled_at
+        )
+        INSERT INTO sales_rollups (event_id, product_id, seller_key, bucket, shard, paid_count, canceled_count,
+                                   revenue, checked_in_count, last_sale_at, last_canceled_at)
+        SELECT event_id, product_id, seller_key, bucket, 0, SUM(paid_count), SUM(canceled_count), SUM(revenue),
+               SUM(checked_in_count), MAX(last_sale_at), MAX(last_canceled_at)
+        FROM merged
+        GROUP BY event_id, product_id, seller_key, bucket
+    """)
+    op.drop_constraint('sales_rollups_pkey', 'sales_rollups', type_='primary')
+    op.create_primary_key('sales_rollups_pkey', 'sales_rollups', ['event_id', 'product_id', 'seller_key', 'bucket'])
+    op.drop_column('sales_rollups', 'shard')
@@ -0,0 +1,90 @@
+"""Request throughput benchmark for the sync vs async sale routes.
+
+Start the API twice, once per mode, and point the benchmark at both:
+
+    ASYNC_DB_ENABLED=false uvicorn main:app --port 8000 --workers 1
+    ASYNC_DB_ENABLED=true  uvicorn main:app --port 8001 --workers 1
+
+    python -m benchmarks.http_benchmark --token <JWT> --product-id 1 \
+        --base-url http://localhost:8000 --base-url http://localhost:8001 \
+        --requests 2000 --concurrency 200
+
+Each request creates a sale on POST /sale/commissioned (use a product with
+unlimited stock). With --check-in it replays POST /sale/check/{code} for the
+codes it just sold instead, which exercises the gate path.
+Requires httpx (pip install httpx), which is not an API dependency.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run_requests(client: httpx.AsyncClient, make_request, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async def one(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await make_request(index)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            return response
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(one(index) for index in range(total)))
+    return time.perf_counter() - started, latencies, statuses, responses
+
+
+def report(label: str, elapsed: float, latencies: list[float], statuses: dict):
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<45} {len(latencies) / elapsed:>8.0f} req/s  p50 {p50:>7.1f} ms  p99 {p99:>7.1f} ms  status {statuses}")
+
+
+async def benchmark(base_url: str, args):
+    headers = {"Authorization": f"Bearer {args.token}"}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+
+        async def sell(index: int):
+            return await client.post("/sale/commissioned", json={
+                "buyer_name": f"Comprador {index}",
+                "buyer_email": f"comprador{index}@benchmark.local",
+                "product_id": args.product_id,
+            })
+
+        elapsed, latencies, statuses, responses = await run_requests(client, sell, args.requests, args.concurrency)
+        report(f"{base_url} POST /sale/commissioned", elapsed, latencies, statuses)
+
+        if args.check_in:
+            codes = [r.json()["unique_code"] for r in responses if r.status_code == 200]
+
+            async def check(index: int):
+                return await client.post(f"/sale/check/{codes[index % len(codes)]}")
+
+            elapsed, latencies, statuses, _ = await run_requests(client, check, len(codes), args.concurrency)
+            report(f"{base_url} POST /sale/check/{{code}}", elapsed, latencies, statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", action="append", required=True)
+    parser.add_argument("--token", required=True, help="JWT de um comissário/admin do evento")
+    parser.add_argument("--product-id", type=int, required=True)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--check-in", action="store_true")
+    args = parser.parse_args()
+
+    for base_url in args.base_url:
+        asyncio.run(benchmark(base_url, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Micro-benchmark of the confirmation email template rendering.
+
+Compares the old path (read the file from disk + str.format on every send)
+with the precompiled, mtime-checked Jinja2 cache in utils.template_utils:
+
+    python -m benchmarks.template_benchmark --iterations 20000
+"""
+import argparse
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from utils.template_utils import TEMPLATES_DIR, TemplateCache
+
+EMAIL_DATA = {
+    "buyer_name": "Maria da Silva",
+    "event_name": "Uai Festas - Edição de Verão",
+    "product_name": "Pista - 2º lote",
+    "event_date": "20 de dezembro de 2026 às 22:00",
+    "event_location": "Rua da Bahia, 1000 - Belo Horizonte",
+    "product_price": "R$ 80,00",
+}
+
+
+def run(label: str, render, iterations: int) -> float:
+    render()  # aquecimento
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {iterations / elapsed:>12,.0f} renders/s  {elapsed / iterations * 1e6:>8.1f} µs/render")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    # O caminho antigo usava placeholders de str.format ({buyer_name})
+    jinja_source = (TEMPLATES_DIR / "email_confirmation.html").read_text(encoding="utf-8")
+    legacy_source = re.sub(r"\{\{ (\w+) \}\}", r"{\1}", jinja_source)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = Path(tmp) / "email_confirmation.html"
+        legacy_path.write_text(legacy_source, encoding="utf-8")
+
+        legacy = run(
+            "disco + str.format (antigo)",
+            lambda: legacy_path.read_text(encoding="utf-8").format(**EMAIL_DATA),
+            args.iterations,
+        )
+
+    cache = TemplateCache(TEMPLATES_DIR)
+    cache.preload()
+    cached = run(
+        "Jinja2 pré-compilado (TemplateCache)",
+        lambda: cache.render("email_confirmation.html", **EMAIL_DATA),
+        args.iterations,
+    )
+
+    print(f"speedup: {legacy / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
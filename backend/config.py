@@ -1,3 +1,4 @@
+from typing import Dict, Literal, Optional
 from pydantic_settings import BaseSettings
 from fastapi_mail import ConnectionConfig
 
@@ -9,8 +10,96 @@ class Settings(BaseSettings):
     MAIL_PORT: int = 587
     MAIL_STARTTLS: bool = True
     MAIL_SSL_TLS: bool = False
+    MAIL_USE_CREDENTIALS: bool = True
+    MAIL_VALIDATE_CERTS: bool = True
+    # Pool de conexões SMTP persistentes e limite de envio por provedor (MAIL_SERVER -> msgs/s)
+    MAIL_POOL_SIZE: int = 3
+    MAIL_RATE_LIMIT_PER_SECOND: float = 10.0
+    MAIL_PROVIDER_RATE_LIMITS: Dict[str, float] = {}
     
     SECRET_KEY: str
+    # Chave mestre das assinaturas HMAC por evento (QR dos ingressos, manifesto offline); padrão: SECRET_KEY
+    SIGNING_KEY: Optional[str] = None
+    # "database": token de 24h, usuário lido do banco (com cache) a cada requisição
+    # "claims": access token curto com id, papel e eventos do usuário + refresh token revogável
+    AUTH_MODE: Literal["database", "claims"] = "database"
+    CLAIMS_ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Cache do usuário autenticado por token (get_current_user)
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+
+    # Pool dedicado ao bcrypt: logins em massa não tomam o threadpool das outras rotas
+    PASSWORD_HASH_WORKERS: int = 4
+    # Hashes aguardando além disso recebem 503 (Retry-After)
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Custo do bcrypt; None = calibra na subida para ~PASSWORD_HASH_TARGET_MS por hash.
+    # Com vários hosts de hardware diferente, fixe o custo para não haver rehash alternado.
+    PASSWORD_HASH_ROUNDS: Optional[int] = None
+    PASSWORD_HASH_TARGET_MS: float = 250.0
+    PASSWORD_HASH_MIN_ROUNDS: int = 10
+    PASSWORD_HASH_MAX_ROUNDS: int = 14
+
+    # Fuso dos eventos: define "hoje", "semana" e "mês" nos dashboards
+    EVENT_TIMEZONE: str = "America/Sao_Paulo"
+    # Máximo de pontos por série em /dashboard/event/{id}/timeseries (acima disso os buckets são agrupados)
+    TIMESERIES_MAX_POINTS: int = 500
+
+    # Ranking de vendedores em memória (/dashboard/event/{id}/leaderboard)
+    LEADERBOARD_MAX_EVENTS: int = 64
+    LEADERBOARD_RESYNC_SECONDS: float = 30.0
+    LEADERBOARD_TOP_K: int = 10
+
+    # Sub-linhas por chave em sales_rollups: menos disputa de lock em vendas simultâneas
+    ROLLUP_SHARDS: int = 8
+
+    # Cache de papéis por (usuário, evento) usado nas verificações de permissão
+    PERMISSION_CACHE_SIZE: int = 50000
+    PERMISSION_CACHE_TTL_SECONDS: float = 60.0
+
+    # GET /metrics (só para contas admin); False esconde o endpoint
+    METRICS_ENABLED: bool = True
+
+    # Engine/sessão assíncronas para as rotas quentes de vendas e check-in
+    ASYNC_DB_ENABLED: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None # padrão: URL do database.engine com driver asyncpg
+    ASYNC_DB_POOL_SIZE: int = 20
+    ASYNC_DB_MAX_OVERFLOW: int = 10
+
+    # Outbox de emails: workers em background que entregam as confirmações
+    OUTBOX_WORKERS: int = 2
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 2.0
+    OUTBOX_MAX_ATTEMPTS: int = 6
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 10.0
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 1800.0
+    OUTBOX_LEASE_SECONDS: int = 300
+
+    # Quantidade de PNGs de QR code mantidos em memória (LRU por unique_code)
+    QRCODE_CACHE_SIZE: int = 4096
+    # Pool de processos que renderiza os QR codes (0 = renderiza na própria thread)
+    QRCODE_RENDER_WORKERS: int = 2
+    QRCODE_RENDER_MAX_PENDING: int = 16
+    QRCODE_RENDER_CHUNK_SIZE: int = 25
+    # QRs antigos traziam só o UUID; desligar depois que todos os ingressos forem reenviados assinados
+    TICKET_QR_ACCEPT_LEGACY: bool = True
+
+    # Máximo de códigos por chamada em POST /sale/check/batch
+    CHECK_IN_BATCH_MAX_SIZE: int = 200
+
+    # Índice em memória dos check-ins por evento (reescaneamentos respondidos sem ir ao banco)
+    CHECKIN_INDEX_MAX_EVENTS: int = 32
+    CHECKIN_INDEX_MAX_ENTRIES_PER_EVENT: int = 100000
+    CHECKIN_INDEX_AUTH_TTL_SECONDS: float = 60.0
+
+    # Stream da portaria (/dashboard/event/{id}/door)
+    DOOR_MONITOR_RECENT_SCANS: int = 20
+    DOOR_MONITOR_WINDOW_MINUTES: int = 30
+    DOOR_MONITOR_RESYNC_SECONDS: float = 30.0
+
+    # Idempotency-Key das rotas de venda
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
 
     class Config:
         env_file = ".env"
@@ -25,6 +114,6 @@ mail_config = ConnectionConfig(
     MAIL_SERVER=settings.MAIL_SERVER,
     MAIL_STARTTLS=settings.MAIL_STARTTLS,
     MAIL_SSL_TLS=settings.MAIL_SSL_TLS,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True
+    USE_CREDENTIALS=settings.MAIL_USE_CREDENTIALS,
+    VALIDATE_CERTS=settings.MAIL_VALIDATE_CERTS
 )
\ No newline at end of file
@@ -1,8 +1,39 @@
-from database import SessionLocal
+from database import SessionLocal, engine
+from config import settings
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Stack assíncrona opcional (ASYNC_DB_ENABLED): mesmo banco, driver asyncpg
+async_engine = None
+AsyncSessionLocal = None
+
+def init_async_db():
+    global async_engine, AsyncSessionLocal
+    if async_engine is not None:
+        return
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    url = settings.ASYNC_DATABASE_URL or engine.url.set(drivername="postgresql+asyncpg")
+    async_engine = create_async_engine(
+        url,
+        pool_size=settings.ASYNC_DB_POOL_SIZE,
+        max_overflow=settings.ASYNC_DB_MAX_OVERFLOW
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def close_async_db():
+    global async_engine, AsyncSessionLocal
+    if async_engine is not None:
+        await async_engine.dispose()
+    async_engine = None
+    AsyncSessionLocal = None
+
+async def get_async_db():
+    init_async_db()
+    async with AsyncSessionLocal() as db:
+        yield db
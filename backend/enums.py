@@ -18,4 +18,29 @@ class ProductStatus(str, enum.Enum):
     ACTIVE = "active"
     INACTIVE = "inactive"
     OUT_OF_STOCK = "out_of_stock"
-    UNLIMITED_PRODUCT = "unlimited_product"
\ No newline at end of file
+    UNLIMITED_PRODUCT = "unlimited_product"
+
+class EmailOutboxStatus(str, enum.Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+    SKIPPED = "skipped" # venda cancelada antes da entrega
+
+class CheckInOutcome(str, enum.Enum):
+    OK = "ok"
+    ALREADY_CHECKED_IN = "already_checked_in"
+    CANCELED = "canceled"
+    UNKNOWN = "unknown"
+    INVALID = "invalid"
+
+class TimeSeriesBucket(str, enum.Enum):
+    MINUTE = "minute"
+    HOUR = "hour"
+    DAY = "day"
+
+class TimeSeriesMetric(str, enum.Enum):
+    SALES = "sales"
+    REVENUE = "revenue"
+    CANCELED = "canceled"
+    CHECK_INS = "check_ins"
\ No newline at end of file
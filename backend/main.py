@@ -1,7 +1,20 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException
 from database import engine
-from routers import product_route, event_route, user_route, auth_route, sale_route, dashboard_route
+from routers import product_route, event_route, user_route, auth_route, sale_route, dashboard_route, async_sale_route
 from fastapi.middleware.cors import CORSMiddleware
+from config import settings
+from dependencies import close_async_db, init_async_db
+from utils.outbox_utils import outbox_workers
+from utils.smtp_utils import mail_sender
+from utils.qrcode_utils import qrcode_cache, qrcode_renderer
+from utils.checkin_index_utils import checkin_index
+from utils.door_monitor_utils import door_monitor
+from utils.leaderboard_utils import seller_leaderboard
+from utils.auth_utils import get_current_user, principal_cache
+from utils.password_utils import password_hasher
+from utils.permission_utils import check_admin_account
+from models import user_model
+from utils.template_utils import email_templates
 
 app = FastAPI()
 
@@ -43,6 +56,14 @@ app.include_router(
     tags=["Authentication"]
 )
 
+if settings.ASYNC_DB_ENABLED:
+    # Registrado antes do sale_route: as versões async respondem nos mesmos paths
+    app.include_router(
+        async_sale_route.router,
+        prefix="/sale",
+        tags=["Vendas"]
+    )
+
 app.include_router(
     sale_route.router,
     prefix="/sale",
@@ -54,8 +75,45 @@ app.include_router(
     prefix="/dashboard",
     tags=["Dashboard"]
 )
+
+
+@app.on_event("startup")
+def start_background_services():
+    if settings.ASYNC_DB_ENABLED:
+        init_async_db()
+    email_templates.preload()
+    password_hasher.start()
+    qrcode_renderer.start()
+    mail_sender.start()
+    outbox_workers.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    outbox_workers.stop()
+    mail_sender.stop()
+    qrcode_renderer.stop()
+    password_hasher.stop()
+    await close_async_db()
     
 
 @app.get("/")
 def read_root():
     return {"message": "API UaiFestas no ar!"}
+
+@app.get("/metrics")
+def read_metrics(current_user: user_model.User = Depends(get_current_user)):
+    # Expõe detalhes internos (SMTP, outbox, hashing): só contas admin, e pode ser desligado
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    check_admin_account(current_user, "Operation not permitted: only admins can read metrics")
+
+    return {
+        "mail": mail_sender.stats(),
+        "qrcode_cache": qrcode_cache.stats(),
+        "qrcode_renderer": qrcode_renderer.stats(),
+        "checkin_index": checkin_index.stats(),
+        "door_monitor": door_monitor.stats(),
+        "seller_leaderboard": seller_leaderboard.stats(),
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher.stats()
+    }
@@ -3,4 +3,8 @@ from .commissioner_event import CommissionerEvent
 from .user_model import User
 from .event_model import Event
 from .product_model import Product
-from .sale_model import Sale
\ No newline at end of file
+from .sale_model import Sale
+from .email_outbox_model import EmailOutbox
+from .idempotency_key_model import IdempotencyKey
+from .refresh_token_model import RefreshToken
+from .sales_rollup_model import SalesRollup
\ No newline at end of file
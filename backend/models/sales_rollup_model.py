@@ -0,0 +1,32 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer
+from database import Base
+
+class SalesRollup(Base):
+    """Agregado por evento × produto × vendedor × hora, mantido na mesma transação das vendas.
+
+    paid_count/canceled_count/revenue ficam na hora em que a venda foi criada
+    (o mesmo critério dos filtros por created_at); checked_in_count fica na
+    hora do check-in. last_sale_at/last_canceled_at guardam o horário exato da
+    última venda e do último cancelamento da linha.
+
+    Cada chave é espalhada em ROLLUP_SHARDS sub-linhas (shard) para vendas
+    simultâneas do mesmo produto não disputarem o lock de uma única linha;
+    quem lê sempre soma (ou pega o máximo) por cima dos shards.
+    """
+    __tablename__ = "sales_rollups"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    seller_key = Column(Integer, primary_key=True, default=0) # seller_id, ou 0 para venda pelo site
+    bucket = Column(DateTime, primary_key=True) # hora UTC, truncada
+    shard = Column(Integer, primary_key=True, default=0)
+    paid_count = Column(Integer, nullable=False, default=0)
+    canceled_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    checked_in_count = Column(Integer, nullable=False, default=0)
+    last_sale_at = Column(DateTime, nullable=True)
+    last_canceled_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_sales_rollups_event_bucket", "event_id", "bucket"),
+    )
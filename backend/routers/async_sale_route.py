@@ -0,0 +1,86 @@
+"""
+Versões async das rotas quentes de /sale, ativadas com ASYNC_DB_ENABLED.
+São registradas antes do sale_route e por isso têm prioridade nos mesmos paths.
+A lógica de negócio continua em sale_utils: AsyncSession.run_sync executa o
+mesmo código sobre a conexão asyncpg, sem ocupar o threadpool do Starlette.
+O email de confirmação vai para o outbox (entregue pelo SMTPSender assíncrono),
+então nenhuma dessas rotas chama asyncio.run.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from dependencies import get_async_db
+from models import user_model
+from schemas import sale_schema
+from utils.auth_utils import get_current_user_async
+from utils.idempotency_utils import create_sale_idempotent
+from utils.sale_utils import check_in_sale_by_code, check_in_batch
+from utils.permission_utils import require_event_role
+from config import settings
+from typing import Optional
+
+router = APIRouter()
+
+def _create_sale(db: Session, sale_data: sale_schema.SaleCreate, user_id: int, key: str | None, seller_id: int | None, after_commit: list):
+    sale = create_sale_idempotent(db=db, sale=sale_data, user_id=user_id, key=key, seller_id=seller_id, after_commit=after_commit)
+    # Serializa ainda dentro do run_sync: lazy loads fora dele não são permitidos
+    return sale_schema.Sale.model_validate(sale)
+
+async def _run_create_sale(db: AsyncSession, sale_data: sale_schema.SaleCreate, user_id: int, key: str | None, seller_id: int | None):
+    # run_sync roda no thread do event loop: os efeitos pós-commit (QR, ranking) vão para o threadpool
+    after_commit: list = []
+    sale = await db.run_sync(_create_sale, sale_data, user_id, key, seller_id, after_commit)
+    for effect in after_commit:
+        await run_in_threadpool(effect)
+    return sale
+
+def _check_in(db: Session, unique_code: str, current_user: user_model.User):
+    return check_in_sale_by_code(db, unique_code, current_user)
+
+def _check_in_batch(db: Session, batch: sale_schema.CheckInBatch, current_user: user_model.User):
+    require_event_role(db, current_user, batch.event_id)
+    return sale_schema.CheckInBatchResult(
+        event_id=batch.event_id,
+        results=check_in_batch(db, batch.event_id, batch.codes)
+    )
+
+@router.post("/commissioned", response_model=sale_schema.Sale)
+async def create_commissioned_sale(
+    sale_data: sale_schema.SaleCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: user_model.User = Depends(get_current_user_async),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
+    return await _run_create_sale(db, sale_data, current_user.id, idempotency_key, current_user.id)
+
+@router.post("/", response_model=sale_schema.Sale)
+async def create_sale_site(
+    sale_data: sale_schema.SaleCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: user_model.User = Depends(get_current_user_async),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
+    if current_user.role not in ["admin", "commissioner", "client"]:
+        raise HTTPException(status_code=403, detail="Operation not permitted: only admins, commissioners and clients can create sales")
+
+    return await _run_create_sale(db, sale_data, current_user.id, idempotency_key, None)
+
+@router.post("/check/batch", response_model=sale_schema.CheckInBatchResult)
+async def check_in_sales_batch(
+    batch: sale_schema.CheckInBatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: user_model.User = Depends(get_current_user_async)
+):
+    if len(batch.codes) > settings.CHECK_IN_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=422, detail=f"At most {settings.CHECK_IN_BATCH_MAX_SIZE} codes per batch")
+
+    return await db.run_sync(_check_in_batch, batch, current_user)
+
+@router.post("/check/{unique_code}", response_model=sale_schema.Sale)
+async def check_in_sale(
+    unique_code: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: user_model.User = Depends(get_current_user_async)
+):
+    return await db.run_sync(_check_in, unique_code, current_user)
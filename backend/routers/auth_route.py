@@ -1,34 +1,97 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from models.user_model import User as UserModel
 from dependencies import get_db
-from utils.password_utils import verify_password 
-from utils.auth_utils import create_access_token   
-from schemas.token_schema import Token
-from sqlalchemy import or_
+from utils.password_utils import password_hasher
+from utils.auth_utils import create_access_token, get_current_user
+from utils.refresh_token_utils import login_with_refresh_token, revoke_refresh_token, revoke_user_sessions, rotate_refresh_token
+from schemas.token_schema import RefreshTokenRequest, Token
+from models import commissioner_event
+from models.association_tables import event_administrators_table
+from config import settings
+from sqlalchemy import exists, or_
 
 router = APIRouter(tags=["Authentication"])
 
+def find_user_by_login(db: Session, login: str):
+    return db.query(UserModel).filter(or_(UserModel.username == login, UserModel.email == login)).first()
+
+def issue_login_tokens(db: Session, user: UserModel, new_hash: str | None):
+    # Hash com custo diferente do atual é trocado de forma transparente no login
+    if new_hash is not None:
+        user.hashed_password = new_hash
+
+    if settings.AUTH_MODE == "claims":
+        return login_with_refresh_token(db, user)
+
+    if new_hash is not None:
+        db.commit()
+    
+    access_token = create_access_token(
+        data = {
+            "sub": user.username,
+            "role": user.role
+        }
+    )
+    
+    return {"access_token": access_token, "token_type": "bearer"}
+
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = db.query(UserModel).filter(or_(UserModel.username == form_data.username, UserModel.email == form_data.username)).first()
+    # async: o bcrypt roda no pool do password_hasher sem ocupar o threadpool das rotas
+    user = await run_in_threadpool(find_user_by_login, db, form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = (await password_hasher.verify(form_data.password, user.hashed_password)) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
         
-    access_token = create_access_token(
-        data = {
-            "sub": user.username,
-            "role": user.role
-        }
-    )
+    return await run_in_threadpool(issue_login_tokens, db, user, new_hash)
+
+def require_claims_mode():
+    if settings.AUTH_MODE != "claims":
+        raise HTTPException(status_code=400, detail="Refresh tokens are only available with AUTH_MODE=claims")
+
+@router.post("/refresh", response_model=Token)
+def refresh_access_token(
+    body: RefreshTokenRequest,
+    db: Session = Depends(get_db)
+):
+    require_claims_mode()
+    return rotate_refresh_token(db, body.refresh_token)
+
+@router.post("/revoke")
+def revoke_token(
+    body: RefreshTokenRequest,
+    db: Session = Depends(get_db)
+):
+    require_claims_mode()
+    revoke_refresh_token(db, body.refresh_token)
+    return {"message": "Refresh token revoked"}
+
+@router.post("/users/{user_id}/revoke")
+def revoke_user_tokens(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    # O próprio usuário, ou um administrador de evento em que ele é comissário
+    administers_user = db.query(exists().where(
+        commissioner_event.CommissionerEvent.user_id == user_id,
+        event_administrators_table.c.event_id == commissioner_event.CommissionerEvent.event_id,
+        event_administrators_table.c.user_id == current_user.id
+    )).scalar()
+    if current_user.id != user_id and not administers_user:
+        raise HTTPException(status_code=403, detail="Operation not permitted: only event administrators can revoke their commissioners")
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    revoke_user_sessions(db, user_id)
+    db.commit()
+    return {"message": f"Sessions of user {user_id} revoked"}
@@ -1,71 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, desc
 from datetime import datetime, timedelta, date
-from typing import Optional, List
+from typing import Literal, Optional, List
+from database import SessionLocal
+from config import settings
 from dependencies import get_db
-from utils.auth_utils import get_current_user
-from utils.dashboard_utils import get_sellers_statistics, get_statistics
+from utils.auth_utils import decode_token, get_current_user
+from utils.permission_utils import event_role_required, require_event_role
+from utils.door_monitor_utils import door_monitor
+from utils.leaderboard_utils import seller_leaderboard
+from utils.dashboard_utils import EVENT_TZ, get_events_summary, get_products_statistics, get_sale_metrics, get_sellers_statistics, get_timeseries, local_today, to_event_local
 from models import user_model, event_model, sale_model, product_model
 from schemas import dashboard_schema
-from enums import SaleStatus, EventStatus
+from enums import SaleStatus, EventStatus, TimeSeriesBucket, TimeSeriesMetric
 
 router = APIRouter()
 
+TOP_PRODUCTS = 5
+
+# Janela padrão da série quando o cliente não informa `start`
+TIMESERIES_DEFAULT_SPANS = {
+    TimeSeriesBucket.MINUTE: timedelta(hours=6),
+    TimeSeriesBucket.HOUR: timedelta(days=7),
+    TimeSeriesBucket.DAY: timedelta(days=90),
+}
+
+@router.get("/summary", response_model=List[dashboard_schema.EventSummary])
+def get_summary(
+    db: Session = Depends(get_db),
+    current_user: user_model.User = Depends(get_current_user)
+):
+    # Só os eventos que o usuário administra; lista vazia quando não há nenhum
+    return get_events_summary(db, current_user.id)
+
 @router.get("/event/{event_id}", response_model=dashboard_schema.EventDashboard)
 def get_event_dashboard(
     event_id: int,
-    days: Optional[int] = Query(30, description="Período de análise em dias"),
+    days: int = Query(30, ge=1, le=366, description="Período de análise em dias"),
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
+    current_user: user_model.User = Depends(event_role_required("admin", detail="Operation not permitted"))
 ):
-    event = db.query(event_model.Event).filter(event_model.Event.id == event_id).first()
+    event = db.get(event_model.Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event Not Found")
     
-    if current_user.role != "admin" and current_user not in event.administrators and current_user not in event.commissioners:
-        raise HTTPException(status_code=403, detail="Operation not permitted")
-    
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
+    end_date = local_today()
+    start_date = end_date - timedelta(days=days - 1)
     
-    stats = get_statistics(db, event_id, start_date.date(), end_date.date(), current_user)
-    
-    # Get additional event statistics
-    total_products = db.query(func.count(product_model.Product.id)).filter(
-        product_model.Product.event_id == event_id
-    ).scalar()
-    
-    total_sellers = db.query(func.count(func.distinct(sale_model.Sale.seller_id))).filter(
-        sale_model.Sale.product_id.in_(
-            db.query(product_model.Product.id).filter(product_model.Product.event_id == event_id)
-        )
-    ).scalar()
-    
-    # Calculate sales metrics for the period
-    paid_sales = stats["total_sales"]
-    canceled_sales = stats["total_canceled"]
-    total_revenue = stats["total_revenue"]
-    
-    # Calculate growth percentages (simplified - would need previous period data)
-    sales_growth_percentage = None  # Would need to implement comparison with previous period
-    revenue_growth_percentage = None  # Would need to implement comparison with previous period
-    
-    sales_metrics = dashboard_schema.SaleMetrics(
-        total_sales=paid_sales + canceled_sales,
-        total_revenue=total_revenue,
-        average_ticket=stats["avg_sale_value"],
-        paid_sales=paid_sales,
-        canceled_sales=canceled_sales,
-        today_sales=0,  # Would need to implement daily calculations
-        today_revenue=0.0,  # Would need to implement daily calculations
-        week_sales=0,  # Would need to implement weekly calculations
-        week_revenue=0.0,  # Would need to implement weekly calculations
-        month_sales=paid_sales,  # Using current period as month
-        month_revenue=total_revenue,  # Using current period as month
-        sales_growth_percentage=sales_growth_percentage,
-        revenue_growth_percentage=revenue_growth_percentage
-    )
+    sales_metrics = get_sale_metrics(db, event_id, start_date, end_date)
+    product_stats = get_products_statistics(db, event_id, order_by="revenue", start_date=start_date, end_date=end_date)
     
     dashboard = dashboard_schema.EventDashboard(
         event_id=event.id,
@@ -74,9 +59,9 @@ def get_event_dashboard(
         event_date=event.event_date,
         created=event.created,
         sales_metrics=sales_metrics,
-        product_stats=[],  # Would need to implement product statistics
-        seller_stats=[],  # Would need to implement seller statistics
-        top_products=[],  # Would need to implement top products
+        product_stats=product_stats,
+        seller_stats=seller_leaderboard.top(db, event_id, settings.LEADERBOARD_TOP_K),
+        top_products=product_stats[:TOP_PRODUCTS],
         analysis_period_days=str(days)
     )
     
@@ -88,80 +73,116 @@ def get_sales_metrics(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
-):
-    event = db.query(event_model.Event).filter(event_model.Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event Not Found")
-    
-    if current_user.role != "admin" or current_user not in event.administrators:
-        raise HTTPException(status_code=403, detail="Operation not permitted")
-    
-    if not start_date:
-        start_date = datetime.utcnow().date() - timedelta(days=30)
-    
+    current_user: user_model.User = Depends(event_role_required("admin", detail="Operation not permitted", admin_account="Operation not permitted"))
+):    
+    # Datas no fuso do evento (EVENT_TIMEZONE)
     if not end_date:
-        end_date = datetime.utcnow().date()
+        end_date = local_today()
+
+    if not start_date:
+        start_date = end_date - timedelta(days=30)
         
     if start_date > end_date:
         raise HTTPException(status_code=400, detail="start_date must be before end_date")
     
-    stats = get_statistics(db, event_id, start_date, end_date, current_user)
+    return get_sale_metrics(db, event_id, start_date, end_date)
 
-    cancellation_rate = (stats["total_canceled"] / (stats["total_sales"] + stats["total_canceled"]) * 100) if (stats["total_sales"] + stats["total_canceled"]) > 0 else 0.0
-    
-    total_sales = stats["total_sales"]
-        
-    metrics = dashboard_schema.SaleMetrics(
-        total_sales=total_sales,
-        total_revenue=stats["total_revenue"],
-        avg_sale_value=stats["avg_sale_value"],
-        total_canceled=stats["total_canceled"],
-        cancellation_rate=cancellation_rate
-    )
-    
-    return metrics
+@router.get("/event/{event_id}/timeseries", response_model=dashboard_schema.TimeSeries)
+def get_sales_timeseries(
+    event_id: int,
+    bucket: TimeSeriesBucket = Query(TimeSeriesBucket.HOUR),
+    metric: TimeSeriesMetric = Query(TimeSeriesMetric.SALES),
+    start: Optional[datetime] = Query(None, description="Início; sem fuso = horário do evento"),
+    end: Optional[datetime] = Query(None, description="Fim (exclusivo); padrão: agora"),
+    max_points: int = Query(settings.TIMESERIES_MAX_POINTS, ge=2, le=5000),
+    db: Session = Depends(get_db),
+    current_user: user_model.User = Depends(event_role_required("admin", detail="Operation not permitted", admin_account="Operation not permitted"))
+):
+    if end is None:
+        end = datetime.now(EVENT_TZ)
+    if start is None:
+        start = end - TIMESERIES_DEFAULT_SPANS[bucket]
+
+    if to_event_local(start) >= to_event_local(end):
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    return get_timeseries(db, event_id, metric, bucket, start, end, max_points)
 
 @router.get("/event/{event_id}/products", response_model=List[dashboard_schema.ProductSalesStats])
 def get_products_stats(
     event_id: int,
-    limit: Optional[int] = Query(None, description="Limitar quantidade de produtos"),
-    order_by: str = Query("sales", description="Ordenar por: sales, revenue"),
+    limit: Optional[int] = Query(None, ge=1, description="Limitar quantidade de produtos"),
+    order_by: Literal["sales", "revenue"] = Query("sales", description="Ordenar por: sales, revenue"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
+    current_user: user_model.User = Depends(event_role_required("admin", detail="Operation not permitted", admin_account="Operation not permitted"))
 ):
-    event = db.query(event_model.Event).filter(event_model.Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event Not Found")
+    # Datas no fuso do evento (EVENT_TIMEZONE); sem datas, todas as vendas
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
 
-    if current_user.role != "admin" or current_user not in event.administrators:
-        raise HTTPException(status_code=403, detail="Operation not permitted")
+    return get_products_statistics(db, event_id, order_by, limit, start_date, end_date)
 
-    products = db.query(product_model.Product).filter(product_model.Product.event_id == event_id)
+@router.get("/event/{event_id}/sellers", response_model=List[dashboard_schema.SallerStats])
+def get_sellers_stats(
+    event_id: int,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: user_model.User = Depends(event_role_required("admin", detail="Operation not permitted", admin_account="Operation not permitted"))
+):
+    # Datas no fuso do evento (EVENT_TIMEZONE)
+    if not end_date:
+        end_date = local_today()
 
-    if order_by == "revenue":
-        products = products.join(sale_model.Sale).filter(sale_model.Sale.status == SaleStatus.PAID).group_by(product_model.Product.id).order_by(func.sum(product_model.Product.price).desc())
-    else:
-        products = products.join(sale_model.Sale).filter(sale_model.Sale.status == SaleStatus.PAID).group_by(product_model.Product.id).order_by(func.count(sale_model.Sale.id).desc())
+    if not start_date:
+        start_date = end_date - timedelta(days=30)
 
-    if limit:
-        products = products.limit(limit)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
 
-    return products.all()
+    return get_sellers_statistics(db, event_id, start_date, end_date)
 
-@router.get("/event/{event_id}/sellers", response_model=List[dashboard_schema.SallerStats])
-def get_sellers_stats(
+@router.get("/event/{event_id}/leaderboard", response_model=List[dashboard_schema.SallerStats])
+def get_sellers_leaderboard(
     event_id: int,
+    limit: int = Query(settings.LEADERBOARD_TOP_K, ge=1, le=100),
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
+    current_user: user_model.User = Depends(event_role_required())
 ):
-    event = db.query(event_model.Event).filter(event_model.Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event Not Found")
+    # Ranking do evento inteiro, servido da memória (ver utils.leaderboard_utils)
+    return seller_leaderboard.top(db, event_id, limit)
 
-    if current_user.role != "admin" or current_user not in event.administrators:
-        raise HTTPException(status_code=403, detail="Operation not permitted")
+def authorize_door_monitor(event_id: int, token: str):
+    # Mesma regra do dashboard do evento; sessão curta, não fica presa ao WebSocket
+    # (o token vem na query, então o usuário é resolvido aqui e não pela dependência)
+    token_data = decode_token(token)
+    with SessionLocal() as db:
+        current_user = db.query(user_model.User).filter(user_model.User.username == token_data.username).first()
+        if current_user is None:
+            raise HTTPException(status_code=401, detail="Could not validate credentials")
 
-    sellers_stats = get_sellers_statistics(db, event_id, datetime.utcnow().date() - timedelta(days=30), datetime.utcnow().date(), current_user)
-    
-    return sellers_stats
\ No newline at end of file
+        require_event_role(db, current_user, event_id, detail="Operation not permitted")
+
+@router.websocket("/event/{event_id}/door")
+async def door_monitor_stream(
+    websocket: WebSocket,
+    event_id: int,
+    token: str = Query(..., description="JWT de acesso (navegadores não enviam Authorization no WebSocket)")
+):
+    try:
+        await run_in_threadpool(authorize_door_monitor, event_id, token)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+        return
+
+    await websocket.accept()
+    queue = await door_monitor.subscribe(event_id)
+    try:
+        while True:
+            await websocket.send_text(await queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        door_monitor.unsubscribe(event_id, queue)
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from utils.auth_utils import get_current_user
+from utils.auth_utils import get_current_user, invalidate_principal
+from utils.permission_utils import event_role_required, get_event_role, invalidate_event_permissions
 from models import user_model, event_model
 from schemas import event_schema, product_schema
 from enums import UserRole
@@ -65,17 +66,17 @@ def update_event(
     id_event: int,
     event: event_schema.EventBase,
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
+    current_user: user_model.User = Depends(event_role_required(
+        UserRole.ADMIN,
+        detail="Operation not permitted: you can only update your own events",
+        admin_account="Operation not permitted: only admins can update events"
+    ))
     ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Operation not permitted: only admins can update events")
-    
-    db_event = db.query(event_model.Event).filter(event_model.Event.id == id_event).first()
+    db_event = db.get(event_model.Event, id_event)
     
+    # O papel pode vir do token/cache; o evento pode ter sido removido depois
     if not db_event:
         raise HTTPException(status_code=404, detail=NOT_FOUND)
-    elif all(admin.id != current_user.id for admin in db_event.administrators):
-        raise HTTPException(status_code=403, detail="Operation not permitted: you can only update your own events")
     
     if event.name != None:
         db_event.name = event.name
@@ -110,21 +111,20 @@ def update_event(
 def delete_event(
     id_event: int,
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
+    current_user: user_model.User = Depends(event_role_required(
+        UserRole.ADMIN,
+        detail="Operation not permitted: you can only update your own events",
+        admin_account="Operation not permitted: only admins can delete events"
+    ))
     ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Operation not permitted: only admins can delete events")
-    
-    db_event = db.query(event_model.Event).filter(event_model.Event.id == id_event).first()
+    db_event = db.get(event_model.Event, id_event)
     
     if not db_event:
         raise HTTPException(status_code=404, detail=NOT_FOUND)
-
-    if all(admin.id != current_user.id for admin in db_event.administrators):
-        raise HTTPException(status_code=403, detail="Operation not permitted: you can only update your own events")
     
     db.delete(db_event)
     db.commit()
+    invalidate_event_permissions(event_id=id_event)
 
     return {"message": f"Item with {id_event} deleted successfully"}
 
@@ -142,27 +142,24 @@ def add_event_admin(
     id_event: int,
     email_user: str,
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
+    current_user: user_model.User = Depends(event_role_required(UserRole.ADMIN, detail="Operation not permitted: only admins can add event administrators"))
 ):
-    db_event = db.query(event_model.Event).filter(event_model.Event.id == id_event).first()
-    if not db_event:
-        raise HTTPException(status_code=404, detail=NOT_FOUND)
-
-    if current_user not in db_event.administrators:
-        raise HTTPException(status_code=403, detail="Operation not permitted: only admins can add event administrators")
-
-    
     new_admin = db.query(user_model.User).filter(user_model.User.email == email_user).first()
     if not new_admin:
         raise HTTPException(status_code=404, detail="User Not Found")
 
-    new_admin.role = UserRole.ADMIN
-    if new_admin in db_event.administrators:
+    if get_event_role(db, new_admin, id_event) == UserRole.ADMIN:
         raise HTTPException(status_code=400, detail="User is already an administrator of this event")
+    new_admin.role = UserRole.ADMIN
     
+    db_event = db.get(event_model.Event, id_event)
+    if not db_event:
+        raise HTTPException(status_code=404, detail=NOT_FOUND)
     db_event.administrators.append(new_admin)
     
     db.commit()
+    invalidate_principal(new_admin.id)
+    invalidate_event_permissions(user_id=new_admin.id, event_id=id_event)
     db.refresh(db_event)
 
     return db_event
@@ -173,27 +170,22 @@ def create_commissioner_for_event(
     id_event: int,
     email_user: str,
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
+    current_user: user_model.User = Depends(event_role_required(UserRole.ADMIN, detail="Operation not permitted: only event administrators can add commissioners"))
 ):
-    event = db.query(event_model.Event).filter(event_model.Event.id == id_event).first()
-    if not event:
-        raise HTTPException(status_code=404, detail=NOT_FOUND)
-    
-    if current_user not in event.administrators:
-        raise HTTPException(status_code=403, detail="Operation not permitted: only event administrators can add commissioners")
-    
     new_commissioner = db.query(user_model.User).filter(user_model.User.email == email_user).first()
     if not new_commissioner:
         raise HTTPException(status_code=404, detail="User Not Found")
     
     new_commissioner.role = UserRole.COMMISSIONER
-    db_event = db.query(event_model.Event).filter(event_model.Event.id == id_event).first()
+    db_event = db.get(event_model.Event, id_event)
     if not db_event:
         raise HTTPException(status_code=404, detail=NOT_FOUND)
 
     db_event.commissioners.append(new_commissioner)
 
     db.commit()
+    invalidate_principal(new_commissioner.id)
+    invalidate_event_permissions(user_id=new_commissioner.id, event_id=id_event)
     db.refresh(db_event)
 
     return db_event
\ No newline at end of file
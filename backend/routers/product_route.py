@@ -4,7 +4,10 @@ from models import user_model, product_model
 from schemas import product_schema
 from dependencies import get_db
 from utils.auth_utils import get_current_user
-from utils.product_utils import check_admin_permission_for_event 
+from utils.permission_utils import check_admin_account, event_role_required, require_event_role
+
+PRODUCT_PERMISSION_DETAIL = "Operation not permitted: you can only manage products of your own events"
+ADMIN_ACCOUNT_DETAIL = "Operation not permitted: only admins can perform this action"
 
 router = APIRouter()
 
@@ -13,10 +16,8 @@ def create_product(
     event_id: int,
     product: product_schema.ProductCreate,
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
+    current_user: user_model.User = Depends(event_role_required("admin", detail=PRODUCT_PERMISSION_DETAIL, admin_account=ADMIN_ACCOUNT_DETAIL))
 ):
-    check_admin_permission_for_event(db, current_user, event_id)
-
     db_product = product_model.Product(**product.dict(), event_id=event_id)
 
     db.add(db_product)
@@ -49,7 +50,8 @@ def update_by_id(
     if not db_product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not Found")
 
-    check_admin_permission_for_event(db, current_user, db_product.event_id)
+    check_admin_account(current_user, ADMIN_ACCOUNT_DETAIL)
+    require_event_role(db, current_user, db_product.event_id, ("admin",), PRODUCT_PERMISSION_DETAIL)
 
     product_data = product.dict(exclude_unset=True)
     for key, value in product_data.items():
@@ -69,7 +71,8 @@ def delete_by_id(
     db_product = db.query(product_model.Product).filter(product_model.Product.id == id_product).first()
     
     if db_product:
-        check_admin_permission_for_event(db, current_user, db_product.event_id)
+        check_admin_account(current_user, ADMIN_ACCOUNT_DETAIL)
+        require_event_role(db, current_user, db_product.event_id, ("admin",), PRODUCT_PERMISSION_DETAIL)
         
         db.delete(db_product)
         db.commit()
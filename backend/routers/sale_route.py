@@ -1,16 +1,26 @@
 from datetime import date, datetime
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+import base64
+import time
 from sqlalchemy.orm import Session
-from utils.qrcode_utils import generate_qrcode_image_in_memory
+from utils.qrcode_utils import TICKET_KEY_PURPOSE, get_ticket_qrcode_png, ticket_qr_payload
 from dependencies import get_db
 from models import user_model, sale_model, product_model, event_model
 from schemas import sale_schema
 from utils.auth_utils import get_current_user
-from utils.sale_utils import create_sale, validate_event_admin_access
-from utils.email_utils import formated_email_to_send
+from utils.sale_utils import check_in_sale_by_code, check_in_batch
+from utils.permission_utils import event_role_required, require_event_role
+from utils.rollup_utils import record_cancellation
+from utils.leaderboard_utils import seller_leaderboard
+from config import settings
+from utils.idempotency_utils import create_sale_idempotent
+from utils.outbox_utils import enqueue_ticket_email, outbox_workers, skip_sale_emails
+from utils.scanner_utils import MANIFEST_KEY_PURPOSE, apply_offline_check_ins, build_manifest
+from utils.signature_utils import event_key
 from typing import Optional, List
 from enums import SaleStatus
 import os
+import uuid
 
 router = APIRouter()
 
@@ -18,21 +28,23 @@ router = APIRouter()
 def create_commissioned_sale(
     sale_data: sale_schema.SaleCreate,
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
+    current_user: user_model.User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
     
-    return create_sale(db=db, sale=sale_data, seller_id=current_user.id)
+    return create_sale_idempotent(db=db, sale=sale_data, user_id=current_user.id, key=idempotency_key, seller_id=current_user.id)
 
 @router.post("/", response_model=sale_schema.Sale)
 def create_sale_site(
     sale_data: sale_schema.SaleCreate,
     db: Session = Depends(get_db),
-    current_user: user_model.User = Depends(get_current_user)
+    current_user: user_model.User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
     if current_user.role not in ["admin", "commissioner", "client"]:
         raise HTTPException(status_code=403, detail="Operation not permitted: only admins, commissioners and clients can create sales")
 
-    return create_sale(db=db, sale=sale_data)
+    return create_sale_idempotent(db=db, sale=sale_data, user_id=current_user.id, key=idempotency_key)
 
 @router.post("/{id_sale}/resend", response_model=sale_schema.Sale)
 def resend_qrcode_mail(
@@ -49,7 +61,10 @@ def resend_qrcode_mail(
     if not db_sale:
         raise HTTPException(status_code=404, detail="Sale Not Found")
     
-    formated_email_to_send(db_sale)
+    enqueue_ticket_email(db, db_sale)
+    db.commit()
+    db.refresh(db_sale)
+    outbox_workers.notify()
 
     return db_sale
 
@@ -74,10 +89,11 @@ def alter_mail_name(
     if sale.buyer_name is not None:
         db_sale.buyer_name = sale.buyer_name
     
-    formated_email_to_send(db_sale)
+    enqueue_ticket_email(db, db_sale)
     
     db.commit()
     db.refresh(db_sale)
+    outbox_workers.notify()
     
     return db_sale
 
@@ -134,6 +150,50 @@ def get_sale_by_id(id_sale: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Sale Not Found")
     return sale
 
+@router.get("/ticket/{unique_code}/qrcode")
+def download_ticket_qrcode(
+    unique_code: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: user_model.User = Depends(get_current_user)
+    ):
+    sale = db.query(sale_model.Sale.status, sale_model.Sale.buyer_email, product_model.Product.event_id)\
+        .join(sale_model.Sale.product)\
+        .filter(sale_model.Sale.unique_code == unique_code)\
+        .first()
+    if not sale:
+        raise HTTPException(status_code=404, detail="Sale Not Found")
+    
+    # O QR assinado vale como ingresso: só o comprador ou a equipe do evento
+    if sale.buyer_email.lower() != current_user.email.lower():
+        require_event_role(db, current_user, sale.event_id, detail="Operation not permitted: only the buyer or the event staff can download this ticket")
+    
+    if sale.status == SaleStatus.CANCELED:
+        raise HTTPException(status_code=400, detail="Sale is canceled")
+    
+    return Response(
+        content=get_ticket_qrcode_png(ticket_qr_payload(sale.event_id, unique_code)),
+        media_type="image/png",
+        headers={"Cache-Control": "private, max-age=86400"}
+    )
+
+# Declarada antes de /check/{unique_code} para "batch" não ser lido como código
+@router.post("/check/batch", response_model=sale_schema.CheckInBatchResult)
+def check_in_sales_batch(
+    batch: sale_schema.CheckInBatch,
+    db: Session = Depends(get_db),
+    current_user: user_model.User = Depends(get_current_user)
+    ):
+    
+    if len(batch.codes) > settings.CHECK_IN_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=422, detail=f"At most {settings.CHECK_IN_BATCH_MAX_SIZE} codes per batch")
+    
+    require_event_role(db, current_user, batch.event_id)
+    
+    return sale_schema.CheckInBatchResult(
+        event_id=batch.event_id,
+        results=check_in_batch(db, batch.event_id, batch.codes)
+    )
+
 @router.post("/check/{unique_code}", response_model=sale_schema.Sale)
 def check_in_sale(
     unique_code: str, 
@@ -141,29 +201,49 @@ def check_in_sale(
     current_user: user_model.User = Depends(get_current_user)
     ):
     
-    db_event = db.query(event_model.Event).join(event_model.Event.products).join(product_model.Product.sales).filter(sale_model.Sale.unique_code == unique_code).first()
-    if not db_event:
-        raise HTTPException(status_code=404, detail="Event Not Found")
-    
-    acesso = validate_event_admin_access(db, current_user, db_event.id)
-    if acesso not in ["admin", "commissioner"]:
-        raise HTTPException(status_code=403, detail="Operation not permitted: only admins and commissioners can check in sales")
+    return check_in_sale_by_code(db, unique_code, current_user)
+
+@router.get("/event/{event_id}/manifest", response_model=sale_schema.ScannerManifest)
+def get_scanner_manifest(
+    event_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: user_model.User = Depends(event_role_required()),
+    if_none_match: Optional[str] = Header(None)
+    ):
     
-    sale = db.query(sale_model.Sale).filter(sale_model.Sale.unique_code == unique_code).first()
-    if not sale:
-        raise HTTPException(status_code=404, detail="Sale Not Found")
+    manifest = build_manifest(db, event_id)
+    etag = f'"{manifest.version}"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
     
-    if sale.status == SaleStatus.CANCELED:
-        raise HTTPException(status_code=400, detail="Sale is canceled and cannot be checked in")
+    response.headers["ETag"] = etag
+    return manifest
+
+@router.get("/event/{event_id}/manifest/key", response_model=sale_schema.ScannerManifestKey)
+def get_scanner_manifest_key(
+    event_id: int,
+    current_user: user_model.User = Depends(event_role_required("admin", detail="Operation not permitted: only admins can provision scanners"))
+    ):
     
-    if sale.checked_at is not None:
-        raise HTTPException(status_code=400, detail="Sale already checked in")
+    return sale_schema.ScannerManifestKey(
+        event_id=event_id,
+        key=base64.b64encode(event_key(event_id, MANIFEST_KEY_PURPOSE)).decode(),
+        ticket_key=base64.b64encode(event_key(event_id, TICKET_KEY_PURPOSE)).decode()
+    )
 
-    sale.checked_at = datetime.utcnow()
-    db.commit()
-    db.refresh(sale)
+@router.post("/event/{event_id}/offline-checkins", response_model=sale_schema.OfflineCheckInResult)
+def sync_offline_check_ins(
+    event_id: int,
+    batch: sale_schema.OfflineCheckInBatch,
+    db: Session = Depends(get_db),
+    current_user: user_model.User = Depends(event_role_required())
+    ):
     
-    return sale
+    result = apply_offline_check_ins(db, event_id, batch.check_ins)
+    print(f"📥 Sync offline do evento {event_id} (aparelho {batch.device_id}, manifesto {batch.manifest_version}): {result.applied} check-ins aplicados, {len(result.conflicts)} conflitos")
+    
+    return result
 
 @router.put("/{id_sale}/cancel", response_model=sale_schema.Sale)
 def cancel_sale(
@@ -172,18 +252,12 @@ def cancel_sale(
     current_user: user_model.User = Depends(get_current_user)
     ):
     
-    db_event = db.query(event_model.Event).join(event_model.Event.products).join(product_model.Product.sales).filter(sale_model.Sale.id == id_sale).first()
-    if not db_event:
-        raise HTTPException(status_code=404, detail="Event Not Found")
-
-    acesso = validate_event_admin_access(db, current_user, db_event.id)
-
-    if acesso != "admin":
-        raise HTTPException(status_code=403, detail="Operation not permitted: only admins can cancel sales")
-    
-    sale = db.query(sale_model.Sale).filter(sale_model.Sale.id == id_sale).first()
+    # FOR UPDATE: dois cancelamentos (ou cancelamento e check-in) simultâneos não contam duas vezes no agregado
+    sale = db.query(sale_model.Sale).filter(sale_model.Sale.id == id_sale).with_for_update().first()
     if not sale:
         raise HTTPException(status_code=404, detail="Sale Not Found")
+
+    require_event_role(db, current_user, sale.product.event_id, ("admin",), "Operation not permitted: only admins can cancel sales")
     
     if sale.status == SaleStatus.CANCELED:
         raise HTTPException(status_code=400, detail="Sale already canceled")
@@ -194,7 +268,11 @@ def cancel_sale(
     
     sale.status = SaleStatus.CANCELED
     sale.canceled_at = datetime.utcnow()
+    record_cancellation(db, sale.product.event_id, sale)
+    skip_sale_emails(db, sale.id)
     db.commit()
+    committed_at = time.monotonic()
     db.refresh(sale)
+    seller_leaderboard.record_cancellation(sale.product.event_id, sale.seller_id, sale.product_id, sale.sale_price, committed_at)
     
     return sale
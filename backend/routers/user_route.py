@@ -1,22 +1,18 @@
 import datetime
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from utils.auth_utils import get_current_user
+from starlette.concurrency import run_in_threadpool
+from utils.auth_utils import get_current_user, invalidate_principal
 from schemas import user_schema, event_schema
 from models import user_model
 from dependencies import get_db
 from utils import password_utils
+from utils.refresh_token_utils import revoke_user_sessions
+from utils.permission_utils import invalidate_event_permissions
 
 router = APIRouter()
 
-@router.post("/", response_model=user_schema.User)
-def create_user(user: user_schema.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(user_model.User).filter(user_model.User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email já Registrado")
-    
-    hash_pass = password_utils.hash_password(user.password)
-    
+def insert_user(db: Session, user: user_schema.UserCreate, hash_pass: str):
     new_user = user_model.User(
         email = user.email,
         username = user.username,
@@ -32,6 +28,16 @@ def create_user(user: user_schema.UserCreate, db: Session = Depends(get_db)):
     
     return new_user
 
+@router.post("/", response_model=user_schema.User)
+async def create_user(user: user_schema.UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(lambda: db.query(user_model.User).filter(user_model.User.email == user.email).first())
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email já Registrado")
+    
+    hash_pass = await password_utils.password_hasher.hash(user.password)
+    
+    return await run_in_threadpool(insert_user, db, user, hash_pass)
+
 @router.get("/", response_model=list[user_schema.User])
 def get_users(db: Session = Depends(get_db)):
     db_users = db.query(user_model.User).all()
@@ -78,12 +84,19 @@ def update_user(
 
     if user.username is not None:
         db_user.username = user.username
+    # Troca de senha ou de papel derruba as sessões já abertas
+    revoke_sessions = False
     if user.password is not None:
         db_user.hashed_password = password_utils.hash_password(user.password)
-    if user.role is not None:
+        revoke_sessions = True
+    if user.role is not None and user.role != db_user.role:
         db_user.role = user.role
+        revoke_sessions = True
 
+    if revoke_sessions:
+        revoke_user_sessions(db, id_user)
     db.commit()
+    invalidate_principal(id_user)
     db.refresh(db_user)
     
     return db_user
@@ -104,6 +117,8 @@ def delete_user(
     elif current_user.role != "admin" and db_user.role != "commissioner":
         raise HTTPException(status_code=403, detail="Operation not permitted: only admins can delete commissioners")
     
+    revoke_user_sessions(db, id_user)
     db.delete(db_user)
     db.commit()
+    invalidate_event_permissions(user_id=id_user)
     return {f"message": "User with {id_user} deleted sucessfully"}
\ No newline at end of file
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
+from enums import TimeSeriesBucket, TimeSeriesMetric
     
 class SaleMetrics(BaseModel):
     total_sales: int
@@ -43,6 +44,19 @@ class SallerStats(BaseModel):
 
     sales_by_product: int              # Quantidade por produto
     
+class TimeSeriesPoint(BaseModel):
+    timestamp: datetime  # início do bucket, no fuso do evento
+    value: float
+
+class TimeSeries(BaseModel):
+    event_id: int
+    metric: TimeSeriesMetric
+    bucket: TimeSeriesBucket       # granularidade pedida
+    step_seconds: int              # granularidade entregue (maior quando a série foi reduzida)
+    start: datetime
+    end: datetime
+    points: List[TimeSeriesPoint] = Field(default_factory=list)
+    
 class EventDashboard(BaseModel):
     event_id: int
     event_name: str
@@ -1,6 +1,8 @@
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, Field, validator
 from datetime import datetime
+from typing import List
 import uuid
+from enums import CheckInOutcome
 from .product_schema import Product
 
 class SaleBase(BaseModel):
@@ -33,4 +35,60 @@ class Sale(SaleBase):
     product: Product
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class CheckInBatch(BaseModel):
+    event_id: int
+    codes: List[str] = Field(..., min_length=1)
+
+class CheckInBatchItem(BaseModel):
+    unique_code: str
+    outcome: CheckInOutcome
+    checked_at: datetime | None = None
+
+class CheckInBatchResult(BaseModel):
+    event_id: int
+    results: List[CheckInBatchItem]
+
+class ScannerManifest(BaseModel):
+    event_id: int
+    version: str
+    generated_at: datetime
+    count: int
+    # unique_codes ativos (PAGOS) como UUIDs de 16 bytes concatenados em ordem crescente, em base64
+    codes: str
+    # Bitmap alinhado com `codes` (bit i = ingresso i já tem check-in), em base64
+    checked: str
+    # HMAC-SHA256 (base64url) de "event_id:version:generated_at" com a chave do evento
+    signature: str
+
+class ScannerManifestKey(BaseModel):
+    event_id: int
+    # Chaves HMAC do evento em base64: `key` verifica o manifesto, `ticket_key` os QRs assinados
+    key: str
+    ticket_key: str
+
+class OfflineCheckIn(BaseModel):
+    # Conteúdo lido do QR: UF1.<evento>.<uuid>.<assinatura> ou UUID puro (legado)
+    unique_code: str = Field(..., max_length=200)
+    checked_at: datetime
+
+class OfflineCheckInBatch(BaseModel):
+    device_id: str | None = Field(None, max_length=100)
+    manifest_version: str | None = None
+    check_ins: List[OfflineCheckIn] = Field(..., max_length=5000)
+
+class OfflineCheckInConflict(BaseModel):
+    # Código como foi enviado
+    unique_code: str
+    reason: CheckInOutcome
+    submitted_checked_at: datetime
+    # Horário que ficou valendo (o mais antigo), quando o ingresso tem check-in
+    checked_at: datetime | None = None
+
+class OfflineCheckInResult(BaseModel):
+    # Check-ins novos
+    applied: int
+    # Check-ins que já existiam e passaram para um horário anterior
+    corrected: int = 0
+    conflicts: List[OfflineCheckInConflict]
@@ -1,8 +1,22 @@
 from pydantic import BaseModel
+from datetime import datetime
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    # Só no AUTH_MODE=claims
+    refresh_token: str | None = None
+    expires_in: int | None = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
-    username: str | None = None
\ No newline at end of file
+    username: str | None = None
+    expires_at: datetime | None = None
+    # Claims dos tokens curtos do AUTH_MODE=claims
+    user_id: int | None = None
+    role: str | None = None
+    admin_events: list[int] = []
+    commissioner_events: list[int] = []
+    issued_at: datetime | None = None
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""Número de consultas das estatísticas do dashboard.
+
+Cada estatística deve custar uma única ida ao banco, qualquer que seja o
+volume de vendas do evento. As consultas são contadas com um listener
+before_cursor_execute num banco sqlite em memória.
+"""
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, event as sa_event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models  # noqa: F401  (registra todos os models no mapper)
+from benchmarks.dashboard_benchmark import grow, setup
+from database import Base
+from models import event_model, user_model
+from utils.dashboard_utils import get_events_summary, get_products_statistics, get_sale_metrics, get_sellers_statistics, local_today
+from utils.leaderboard_utils import load_seller_ranking
+
+SIZES = (10, 300)
+
+STATISTICS = {
+    "get_sale_metrics": lambda db, seller_id, event_id: get_sale_metrics(db, event_id, local_today() - timedelta(days=29), local_today()),
+    "get_products_statistics": lambda db, seller_id, event_id: get_products_statistics(db, event_id, order_by="revenue", limit=10),
+    "get_sellers_statistics": lambda db, seller_id, event_id: get_sellers_statistics(db, event_id, local_today() - timedelta(days=29), local_today()),
+    "load_seller_ranking": lambda db, seller_id, event_id: load_seller_ranking(db, event_id).top(10),
+    "get_events_summary": lambda db, seller_id, event_id: get_events_summary(db, seller_id),
+}
+
+
+@pytest.fixture
+def database():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    statements: list[str] = []
+    sa_event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    yield sessionmaker(bind=engine, autoflush=False), statements
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name", STATISTICS)
+def test_statistics_take_one_query(database, name):
+    Session, statements = database
+    seller_id, event_id, product_ids = setup(Session)
+    with Session() as db:
+        # O vendedor do benchmark também administra o evento, para o resumo ter o que listar
+        event = db.get(event_model.Event, event_id)
+        event.administrators.append(db.get(user_model.User, seller_id))
+        db.commit()
+
+    counts = []
+    seeded = 0
+    for size in SIZES:
+        grow(Session, seller_id, event_id, product_ids, size - seeded)
+        seeded = size
+        with Session() as db:
+            statements.clear()
+            STATISTICS[name](db, seller_id, event_id)
+            counts.append(len(statements))
+
+    assert counts == [1] * len(SIZES), f"{name}: {counts} consultas para {SIZES} vendas"
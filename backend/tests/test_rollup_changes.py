@@ -0,0 +1,55 @@
+"""RollupChanges.add: deltas da mesma chave (evento, produto, vendedor, hora) se somam."""
+from datetime import datetime
+
+from utils.rollup_utils import ROLLUP_COUNTERS, RollupChanges
+
+AT = datetime(2026, 3, 14, 10, 37, 12)
+
+
+def test_same_hour_merges_into_one_row():
+    changes = RollupChanges()
+    changes.add(1, 10, 7, AT, paid_count=1, revenue=50.0)
+    changes.add(1, 10, 7, AT.replace(minute=59), paid_count=1, revenue=30.0)
+    changes.add(1, 10, 7, AT.replace(minute=5), canceled_count=1, revenue=-50.0)
+
+    assert list(changes._rows) == [(1, 10, 7, datetime(2026, 3, 14, 10))]
+    row = changes._rows[(1, 10, 7, datetime(2026, 3, 14, 10))]
+    assert {counter: row[counter] for counter in ROLLUP_COUNTERS} == {
+        "paid_count": 2, "canceled_count": 1, "revenue": 30.0, "checked_in_count": 0
+    }
+
+
+def test_each_key_component_splits_rows():
+    changes = RollupChanges()
+    changes.add(1, 10, 7, AT, paid_count=1)
+    changes.add(2, 10, 7, AT, paid_count=1)
+    changes.add(1, 11, 7, AT, paid_count=1)
+    changes.add(1, 10, 8, AT, paid_count=1)
+    changes.add(1, 10, 7, AT.replace(hour=11), paid_count=1)
+
+    assert len(changes._rows) == 5
+    assert all(row["paid_count"] == 1 for row in changes._rows.values())
+
+
+def test_sales_without_seller_share_seller_key_zero():
+    changes = RollupChanges()
+    changes.add(1, 10, None, AT, paid_count=1)
+    changes.add(1, 10, 0, AT, paid_count=1)
+
+    assert list(changes._rows) == [(1, 10, 0, datetime(2026, 3, 14, 10))]
+    assert changes._rows[(1, 10, 0, datetime(2026, 3, 14, 10))]["paid_count"] == 2
+
+
+def test_latest_columns_keep_the_greatest_value():
+    changes = RollupChanges()
+    later = AT.replace(minute=50)
+    changes.add(1, 10, 7, AT, last_sale_at=later, paid_count=1)
+    changes.add(1, 10, 7, AT, last_sale_at=AT, paid_count=1)
+    changes.add(1, 10, 7, AT, last_canceled_at=AT, canceled_count=1)
+    changes.add(1, 10, 7, AT, checked_in_count=1)
+
+    row = changes._rows[(1, 10, 7, datetime(2026, 3, 14, 10))]
+    # Um valor menor ou ausente não apaga o maior já visto
+    assert row["last_sale_at"] == later
+    assert row["last_canceled_at"] == AT
+    assert row["checked_in_count"] == 1
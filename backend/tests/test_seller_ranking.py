@@ -0,0 +1,66 @@
+"""SellerRanking.apply: cada delta reposiciona só o vendedor afetado."""
+from types import SimpleNamespace
+
+from utils.leaderboard_utils import SellerRanking
+
+
+def make_ranking() -> SellerRanking:
+    rows = [
+        SimpleNamespace(seller_key=1, username="ana", total_sales=5, total_revenue=250.0, products={10: 5}),
+        SimpleNamespace(seller_key=2, username="bia", total_sales=3, total_revenue=300.0, products={10: 1, 11: 2}),
+        SimpleNamespace(seller_key=3, username="caio", total_sales=3, total_revenue=150.0, products={11: 3}),
+    ]
+    # 2 vendas pelo site (sem vendedor)
+    return SellerRanking(rows, event_sales=13, event_revenue=800.0)
+
+
+def ids(ranking: SellerRanking, limit: int = 10) -> list[int]:
+    return [stats.seller_id for stats in ranking.top(limit)]
+
+
+def test_initial_order_is_sales_then_revenue():
+    # bia e caio empatam em vendas; bia tem mais receita
+    assert ids(make_ranking()) == [1, 2, 3]
+
+
+def test_sale_moves_seller_up():
+    ranking = make_ranking()
+    assert ranking.apply(3, 11, 1, 50.0)
+    assert ranking.apply(3, 10, 1, 50.0)
+    assert ranking.apply(3, 10, 1, 50.0)
+
+    assert ids(ranking) == [3, 1, 2]
+    top = ranking.top(1)[0]
+    assert (top.total_sales, top.total_revenue, top.sales_by_product) == (6, 300.0, 2)
+    assert (ranking.event_sales, ranking.event_revenue) == (16, 950.0)
+    assert top.percentage_of_sales == 37.5
+
+
+def test_cancellation_moves_seller_down_and_drops_empty_products():
+    ranking = make_ranking()
+    assert ranking.apply(2, 10, -1, -100.0)
+
+    assert ids(ranking) == [1, 3, 2]
+    assert ranking.sellers[2][3] == {11: 2}
+    assert (ranking.event_sales, ranking.event_revenue) == (12, 700.0)
+
+
+def test_sale_without_seller_only_changes_event_totals():
+    ranking = make_ranking()
+    assert ranking.apply(None, 10, 1, 80.0)
+
+    assert ids(ranking) == [1, 2, 3]
+    assert (ranking.event_sales, ranking.event_revenue) == (14, 880.0)
+    assert ranking.top(1)[0].total_sales == 5
+
+
+def test_unknown_seller_is_rejected_without_changes():
+    ranking = make_ranking()
+    assert not ranking.apply(99, 10, 1, 50.0)
+
+    assert ids(ranking) == [1, 2, 3]
+    assert (ranking.event_sales, ranking.event_revenue) == (13, 800.0)
+
+
+def test_top_is_limited():
+    assert ids(make_ranking(), 2) == [1, 2]
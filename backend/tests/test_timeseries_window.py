@@ -0,0 +1,64 @@
+"""Janela das séries temporais: início truncado e no máximo max_points buckets."""
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from enums import TimeSeriesBucket
+from utils.dashboard_utils import ROLLUP_STEP, TIMESERIES_BASE_STEPS, timeseries_window
+
+START = datetime(2026, 3, 14, 10, 37, 12, 500)
+
+
+def buckets(start: datetime, end: datetime, step: timedelta) -> int:
+    return math.ceil((end - start) / step)
+
+
+@pytest.mark.parametrize("bucket, expected", [
+    (TimeSeriesBucket.MINUTE, datetime(2026, 3, 14, 10, 37)),
+    (TimeSeriesBucket.HOUR, datetime(2026, 3, 14, 10, 0)),
+    (TimeSeriesBucket.DAY, datetime(2026, 3, 14)),
+])
+def test_start_is_truncated_to_the_step(bucket, expected):
+    start, step = timeseries_window(bucket, START, START + timedelta(hours=3), max_points=500)
+    assert step == TIMESERIES_BASE_STEPS[bucket]
+    assert start == expected
+
+
+@pytest.mark.parametrize("bucket", list(TimeSeriesBucket))
+@pytest.mark.parametrize("span", [timedelta(minutes=59), timedelta(hours=5), timedelta(days=2, minutes=1), timedelta(days=400)])
+@pytest.mark.parametrize("max_points", [1, 5, 24, 500])
+def test_bucket_count_never_exceeds_max_points(bucket, span, max_points):
+    end = START + span
+    start, step = timeseries_window(bucket, START, end, max_points)
+    assert start <= START
+    assert step % TIMESERIES_BASE_STEPS[bucket] == timedelta(0)
+    assert buckets(start, end, step) <= max_points
+
+
+def test_truncation_that_adds_a_bucket_widens_the_step():
+    # 10:59 a 15:59 cabe em 5 horas, mas o início truncado (10:00) pede 6 buckets
+    start = datetime(2026, 3, 14, 10, 59)
+    window_start, step = timeseries_window(TimeSeriesBucket.HOUR, start, start + timedelta(hours=5), max_points=5)
+    assert window_start == datetime(2026, 3, 14, 10, 0)
+    assert step == timedelta(hours=2)
+
+
+@pytest.mark.parametrize("span, max_points", [
+    (timedelta(hours=3), 2),
+    (timedelta(hours=30), 20),
+    (timedelta(days=7), 100),
+])
+def test_minute_series_wider_than_an_hour_use_whole_hours(span, max_points):
+    start, step = timeseries_window(TimeSeriesBucket.MINUTE, START, START + span, max_points)
+    # Passo de horas cheias e início na hora cheia: a série sai dos agregados
+    assert step >= ROLLUP_STEP
+    assert step % ROLLUP_STEP == timedelta(0)
+    assert start == START.replace(minute=0, second=0, microsecond=0)
+
+
+def test_short_minute_series_keep_minute_steps():
+    start = datetime(2026, 3, 14, 10, 37)
+    window_start, step = timeseries_window(TimeSeriesBucket.MINUTE, start, start + timedelta(hours=2), max_points=24)
+    assert step == timedelta(minutes=5)
+    assert window_start == start
@@ -1,13 +1,16 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 from jose import JWTError, jwt
 from schemas.token_schema import TokenData
 from models.user_model import User as UserModel
-from dependencies import get_db
+from dependencies import get_db, get_async_db
 from datetime import datetime, timedelta, timezone
 from schemas import token_schema
 from config import settings
+from .cache_utils import TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login/token")
 
@@ -15,6 +18,13 @@ SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
 ACESS_TOKEN_EXPIRE_MINUTES = 1440
 
+# token -> colunas do usuário autenticado; evita o SELECT em users a cada requisição
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+PRINCIPAL_COLUMNS = [column.key for column in UserModel.__table__.columns]
+
+# user_id -> instante da revogação; access tokens curtos emitidos antes disso são recusados
+revoked_users = TTLCache(maxsize=10000, ttl=settings.CLAIMS_ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACESS_TOKEN_EXPIRE_MINUTES)
@@ -22,24 +32,132 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def create_claims_access_token(user: UserModel, admin_events: list[int], commissioner_events: list[int]) -> str:
+    """Access token curto do AUTH_MODE=claims: as rotas confiam no id, papel e eventos embutidos sem ler users."""
+    now = datetime.now(timezone.utc)
+    return jwt.encode({
+        "sub": user.username,
+        "uid": user.id,
+        "role": user.role,
+        "adm": admin_events,
+        "com": commissioner_events,
+        "typ": "access",
+        "iat": now,
+        # "iat" só tem precisão de segundo; a revogação compara com a emissão em milissegundos
+        "iat_ms": int(now.timestamp() * 1000),
+        "exp": now + timedelta(minutes=settings.CLAIMS_ACCESS_TOKEN_EXPIRE_MINUTES)
+    }, SECRET_KEY, ALGORITHM)
+
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_token(token: str) -> TokenData:
     try:
         # Decodifica o token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
+            raise credentials_exception()
+        expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc) if "exp" in payload else None
+        if payload.get("typ") != "access":
+            return TokenData(username=username, expires_at=expires_at)
+        return TokenData(
+            username=username,
+            expires_at=expires_at,
+            user_id=payload["uid"],
+            role=payload.get("role"),
+            admin_events=payload.get("adm", []),
+            commissioner_events=payload.get("com", []),
+            issued_at=datetime.fromtimestamp(payload.get("iat_ms", payload["iat"] * 1000) / 1000, timezone.utc)
+        )
     except JWTError:
-        raise credentials_exception
+        raise credentials_exception()
+
+def cache_principal(token: str, token_data: TokenData, user: UserModel):
+    ttl = settings.PRINCIPAL_CACHE_TTL_SECONDS
+    if token_data.expires_at is not None:
+        # Nunca além da expiração do próprio token
+        ttl = min(ttl, (token_data.expires_at - datetime.now(timezone.utc)).total_seconds())
+    if ttl > 0:
+        principal_cache.set(token, {column: getattr(user, column) for column in PRINCIPAL_COLUMNS}, ttl=ttl)
+
+def cached_principal(token: str) -> UserModel | None:
+    """Usuário do cache como instância destacada, pronta para db.merge(load=False) sem SELECT."""
+    principal = principal_cache.get(token)
+    if principal is None:
+        return None
+    user = UserModel(**principal)
+    make_transient_to_detached(user)
+    return user
+
+def invalidate_principal(user_id: int):
+    """Chamar sempre que os dados ou o papel do usuário mudarem (ou ele for removido)."""
+    principal_cache.invalidate_where(lambda token, principal: principal["id"] == user_id)
+
+def claims_principal(token_data: TokenData) -> UserModel:
+    """Usuário montado só a partir das claims do token (AUTH_MODE=claims), sem SELECT."""
+    revoked_at = revoked_users.get(token_data.user_id)
+    if revoked_at is not None and token_data.issued_at <= revoked_at:
+        raise credentials_exception()
+
+    user = UserModel(id=token_data.user_id, username=token_data.username, role=token_data.role)
+    make_transient_to_detached(user)
+    return user
+
+def event_role_from_claims(user: UserModel, event_id: int) -> str | None:
+    """Papel do usuário no evento segundo o token, sem banco. None = o token não afirma nada."""
+    token_data = getattr(user, "token_data", None)
+    if token_data is None:
+        return None
+    if event_id in token_data.admin_events:
+        return "admin"
+    if event_id in token_data.commissioner_events:
+        return "commissioner"
+    return None
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    if settings.AUTH_MODE == "claims":
+        token_data = decode_token(token)
+        # Tokens antigos, sem claims, seguem pelo banco
+        if token_data.user_id is not None:
+            user = db.merge(claims_principal(token_data), load=False)
+            user.token_data = token_data
+            return user
+
+    user = cached_principal(token)
+    if user is not None:
+        return db.merge(user, load=False)
+
+    token_data = decode_token(token)
     
     # Busca o usuário no banco de dados
     user = db.query(UserModel).filter(UserModel.username == token_data.username).first()
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
+    cache_principal(token, token_data, user)
+    return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    if settings.AUTH_MODE == "claims":
+        token_data = decode_token(token)
+        if token_data.user_id is not None:
+            user = await db.merge(claims_principal(token_data), load=False)
+            user.token_data = token_data
+            return user
+
+    user = cached_principal(token)
+    if user is not None:
+        return await db.merge(user, load=False)
+
+    token_data = decode_token(token)
+
+    result = await db.execute(select(UserModel).where(UserModel.username == token_data.username))
+    user = result.scalars().first()
+    if user is None:
+        raise credentials_exception()
+    cache_principal(token, token_data, user)
     return user
\ No newline at end of file
@@ -0,0 +1,166 @@
+import threading
+import uuid
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from config import settings
+from models import product_model, sale_model
+from .cache_utils import TTLCache
+
+CODE_SIZE = 16
+
+
+class CheckedInCodes:
+    """Códigos com check-in de um evento, em bytes compactos.
+
+    Os UUIDs ficam ordenados num único `bytes` de 16 bytes por código (busca
+    binária), em vez de um objeto int por código num set. As inserções
+    esperam num buffer pequeno que é intercalado quando passa de 1/8 do total.
+    """
+
+    __slots__ = ("_sorted", "_pending")
+
+    def __init__(self):
+        self._sorted = b""
+        self._pending: set[bytes] = set()
+
+    def __len__(self) -> int:
+        return len(self._sorted) // CODE_SIZE + len(self._pending)
+
+    def __contains__(self, code: bytes) -> bool:
+        if code in self._pending:
+            return True
+        data = self._sorted
+        low, high = 0, len(data) // CODE_SIZE
+        while low < high:
+            mid = (low + high) // 2
+            current = data[mid * CODE_SIZE:(mid + 1) * CODE_SIZE]
+            if current == code:
+                return True
+            if current < code:
+                low = mid + 1
+            else:
+                high = mid
+        return False
+
+    def add(self, code: bytes):
+        if code in self:
+            return
+        self._pending.add(code)
+        if len(self._pending) > max(256, len(self._sorted) // CODE_SIZE // 8):
+            self._merge()
+
+    def update(self, codes):
+        for code in codes:
+            if code not in self:
+                self._pending.add(code)
+        self._merge()
+
+    def _merge(self):
+        data = self._sorted
+        existing = (data[i:i + CODE_SIZE] for i in range(0, len(data), CODE_SIZE))
+        self._sorted = b"".join(sorted([*existing, *self._pending]))
+        self._pending = set()
+
+
+class CheckInIndex:
+    """Índice em memória, por evento, dos ingressos que já têm check-in.
+
+    Só guarda fatos positivos: check-in não se desfaz (venda com check-in não
+    pode ser cancelada), então um código presente aqui está com check-in em
+    qualquer worker, para sempre. Um código ausente apenas segue para o banco,
+    e o resultado do banco alimenta o índice. Por isso cada worker pode ter o
+    seu índice sem coordenação: no pior caso ele está atrasado, nunca errado.
+
+    Memória limitada: no máximo `max_events` eventos (LRU) e
+    `max_entries_per_event` códigos por evento; acima disso o evento continua
+    funcionando, só os novos check-ins deixam de ser indexados.
+
+    O acesso do leitor ao evento também é lembrado (TTL curto), para uma
+    repetição não precisar de nenhuma consulta ao banco.
+    """
+
+    def __init__(self, max_events: int, max_entries_per_event: int, auth_ttl: float):
+        self.max_events = max_events
+        self.max_entries_per_event = max_entries_per_event
+        self._events: OrderedDict[int, CheckedInCodes] = OrderedDict()
+        self._allowed = TTLCache(maxsize=max_events * 256, ttl=auth_ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.warmed = 0
+        self.dropped = 0
+
+    def is_checked_in(self, event_id: int | None, code: uuid.UUID, user_id: int) -> bool:
+        """True se o código já tem check-in e o usuário tem acesso ao evento dele.
+
+        Códigos legados (sem event_id) são procurados em todos os eventos indexados.
+        """
+        key = code.bytes
+        with self._lock:
+            if event_id is None:
+                event_id = next((event for event, codes in self._events.items() if key in codes), None)
+                found = event_id is not None
+            else:
+                found = key in self._events.get(event_id, ())
+            if found:
+                self._events.move_to_end(event_id)
+            found = found and bool(self._allowed.get((event_id, user_id)))
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def allow(self, event_id: int, user_id: int):
+        self._allowed.set((event_id, user_id), True)
+
+    def record(self, event_id: int, codes):
+        with self._lock:
+            entries = self._events.get(event_id)
+            if entries is None:
+                return
+            for code in codes:
+                if len(entries) >= self.max_entries_per_event:
+                    self.dropped += 1
+                    continue
+                entries.add(code.bytes)
+
+    def is_warm(self, event_id: int) -> bool:
+        with self._lock:
+            return event_id in self._events
+
+    def warm(self, db: Session, event_id: int):
+        """Carrega do banco os check-ins já feitos no evento (uma vez por worker)."""
+        rows = db.query(sale_model.Sale.unique_code)\
+            .join(sale_model.Sale.product)\
+            .filter(product_model.Product.event_id == event_id, sale_model.Sale.checked_at.isnot(None))\
+            .limit(self.max_entries_per_event)\
+            .all()
+
+        with self._lock:
+            entries = self._events.setdefault(event_id, CheckedInCodes())
+            entries.update(row.unique_code.bytes for row in rows)
+            self._events.move_to_end(event_id)
+            while len(self._events) > self.max_events:
+                self._events.popitem(last=False)
+            self.warmed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = sum(len(codes) for codes in self._events.values())
+            events = len(self._events)
+        return {
+            "events": events,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "warmed": self.warmed,
+            "dropped": self.dropped,
+        }
+
+
+checkin_index = CheckInIndex(
+    max_events=settings.CHECKIN_INDEX_MAX_EVENTS,
+    max_entries_per_event=settings.CHECKIN_INDEX_MAX_ENTRIES_PER_EVENT,
+    auth_ttl=settings.CHECKIN_INDEX_AUTH_TTL_SECONDS,
+)
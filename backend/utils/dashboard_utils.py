@@ -1,100 +1,439 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import case, func, and_, desc
-from datetime import datetime, timedelta, date
+from sqlalchemy import Integer, case, cast, func, and_, desc, literal, select
+from datetime import datetime, time, timedelta, timezone, date
+import math
+from types import SimpleNamespace
 from typing import Optional, List
+from zoneinfo import ZoneInfo
+from config import settings
 from dependencies import get_db
 from utils.auth_utils import get_current_user
-from models import user_model, event_model, sale_model, product_model
+from models import user_model, event_model, sale_model, product_model, sales_rollup_model, commissioner_event
+from models.association_tables import event_administrators_table
 from schemas import dashboard_schema
-from enums import SaleStatus, EventStatus
+from enums import SaleStatus, EventStatus, TimeSeriesBucket, TimeSeriesMetric
 
 
-def get_statistics(db: Session, event_id: int, start_date: date, end_date: date, current_user: user_model.User):
-    event = db.query(event_model.Event).filter(event_model.Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event Not Found")
-    
-    if current_user.role != "admin" and current_user not in event.administrators:
-        raise HTTPException(status_code=403, detail="Operation not permitted")
+EVENT_TZ = ZoneInfo(settings.EVENT_TIMEZONE)
 
-    total_sales = db.query(func.count(sale_model.Sale.id)).join(product_model.Product).filter(
-        product_model.Product.event_id == event_id,
-        sale_model.Sale.status == SaleStatus.PAID,
-        sale_model.Sale.created_at >= start_date,
-        sale_model.Sale.created_at <= end_date
-    ).scalar()
 
-    total_revenue = db.query(func.coalesce(func.sum(product_model.Product.price), 0)).join(sale_model.Sale).filter(
-        product_model.Product.event_id == event_id,
-        sale_model.Sale.status == SaleStatus.PAID,
-        sale_model.Sale.created_at >= start_date,
-        sale_model.Sale.created_at <= end_date
-    ).scalar()
+def local_today() -> date:
+    return datetime.now(EVENT_TZ).date()
 
-    avg_sale_value = total_revenue / total_sales if total_sales > 0 else 0.0
+def local_day_start(day: date) -> datetime:
+    """Meia-noite de `day` no fuso do evento, em UTC naive (o referencial dos buckets).
 
-    total_canceled = db.query(func.count(sale_model.Sale.id)).join(product_model.Product).filter(
-        product_model.Product.event_id == event_id,
-        sale_model.Sale.status == SaleStatus.CANCELED,
-        sale_model.Sale.created_at >= start_date,
-        sale_model.Sale.created_at <= end_date
-    ).scalar()
-
-    cancellation_rate = (total_canceled / (total_sales + total_canceled) * 100) if (total_sales + total_canceled) > 0 else 0.0
-
-    return {
-        "total_sales": total_sales,
-        "total_revenue": total_revenue,
-        "avg_sale_value": avg_sale_value,
-        "total_canceled": total_canceled,
-        "cancellation_rate": cancellation_rate
+    Fusos com deslocamento de hora cheia (como America/Sao_Paulo) caem
+    exatamente na borda de um bucket horário.
+    """
+    return local_to_utc(datetime.combine(day, time.min))
+
+def local_to_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=EVENT_TZ).astimezone(timezone.utc).replace(tzinfo=None)
+
+def growth_percentage(current: float, previous: float) -> Optional[float]:
+    return round((current - previous) / previous * 100, 2) if previous else None
+
+def get_sale_metrics(db: Session, event_id: int, start_date: date, end_date: date) -> dashboard_schema.SaleMetrics:
+    """Todas as janelas do SaleMetrics numa única consulta aos agregados por hora.
+
+    start_date/end_date são dias (inclusivos) no fuso do evento; o crescimento
+    compara com o período imediatamente anterior de mesma duração.
+    Permissão: verificada pelas rotas (permission_utils).
+    """
+    today = local_today()
+    period_days = end_date - start_date + timedelta(days=1)
+    windows = {
+        "period": (local_day_start(start_date), local_day_start(end_date + timedelta(days=1))),
+        "previous": (local_day_start(start_date - period_days), local_day_start(start_date)),
+        "today": (local_day_start(today), local_day_start(today + timedelta(days=1))),
+        "week": (local_day_start(today - timedelta(days=6)), local_day_start(today + timedelta(days=1))),
+        "month": (local_day_start(today.replace(day=1)), local_day_start(today + timedelta(days=1))),
     }
-    
+
+    Rollup = sales_rollup_model.SalesRollup
+    def window_sum(column, window: str):
+        window_start, window_end = windows[window]
+        return func.coalesce(func.sum(column).filter(Rollup.bucket >= window_start, Rollup.bucket < window_end), 0)
+
+    row = db.query(
+        window_sum(Rollup.paid_count, "period").label("paid_sales"),
+        window_sum(Rollup.canceled_count, "period").label("canceled_sales"),
+        window_sum(Rollup.revenue, "period").label("revenue"),
+        window_sum(Rollup.paid_count, "previous").label("previous_sales"),
+        window_sum(Rollup.revenue, "previous").label("previous_revenue"),
+        window_sum(Rollup.paid_count, "today").label("today_sales"),
+        window_sum(Rollup.revenue, "today").label("today_revenue"),
+        window_sum(Rollup.paid_count, "week").label("week_sales"),
+        window_sum(Rollup.revenue, "week").label("week_revenue"),
+        window_sum(Rollup.paid_count, "month").label("month_sales"),
+        window_sum(Rollup.revenue, "month").label("month_revenue")
+    ).filter(
+        Rollup.event_id == event_id,
+        Rollup.bucket >= min(window_start for window_start, _ in windows.values()),
+        Rollup.bucket < max(window_end for _, window_end in windows.values())
+    ).one()
+
+    paid_sales, canceled_sales, revenue = int(row.paid_sales), int(row.canceled_sales), float(row.revenue)
+
+    return dashboard_schema.SaleMetrics(
+        total_sales=paid_sales + canceled_sales,
+        total_revenue=revenue,
+        average_ticket=revenue / paid_sales if paid_sales > 0 else 0.0,
+        paid_sales=paid_sales,
+        canceled_sales=canceled_sales,
+        today_sales=int(row.today_sales),
+        today_revenue=float(row.today_revenue),
+        week_sales=int(row.week_sales),
+        week_revenue=float(row.week_revenue),
+        month_sales=int(row.month_sales),
+        month_revenue=float(row.month_revenue),
+        sales_growth_percentage=growth_percentage(paid_sales, int(row.previous_sales)),
+        revenue_growth_percentage=growth_percentage(revenue, float(row.previous_revenue))
+    )
+
+TIMESERIES_BASE_STEPS = {
+    TimeSeriesBucket.MINUTE: timedelta(minutes=1),
+    TimeSeriesBucket.HOUR: timedelta(hours=1),
+    TimeSeriesBucket.DAY: timedelta(days=1),
+}
+ROLLUP_STEP = timedelta(hours=1)
+
+def to_event_local(value: datetime) -> datetime:
+    """Datetime naive no fuso do evento (valores naive já são considerados locais)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(EVENT_TZ).replace(tzinfo=None)
+    return value
+
+def truncate_local(value: datetime, step: timedelta) -> datetime:
+    if step >= timedelta(days=1):
+        return datetime.combine(value.date(), time.min)
+    if step >= timedelta(hours=1):
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(second=0, microsecond=0)
+
+def timeseries_step(bucket: TimeSeriesBucket, start: datetime, end: datetime, max_points: int) -> timedelta:
+    """Granularidade entregue: o bucket pedido, agrupado o suficiente para caber em max_points."""
+    base = TIMESERIES_BASE_STEPS[bucket]
+    step = base * max(1, math.ceil((end - start) / base / max_points))
+    if base < ROLLUP_STEP <= step:
+        # Passo de hora(s) cheia(s): pode ler dos agregados em vez da tabela de vendas
+        step = ROLLUP_STEP * math.ceil(step / ROLLUP_STEP)
+    return step
+
+def timeseries_window(bucket: TimeSeriesBucket, start: datetime, end: datetime, max_points: int) -> tuple[datetime, timedelta]:
+    """(início truncado, passo) com no máximo max_points buckets entre o início e `end`.
+
+    Truncar recua o início e pode acrescentar um bucket, então o passo é
+    recalculado sobre o início já truncado até caber.
+    """
+    step = timeseries_step(bucket, start, end, max_points)
+    start = truncate_local(start, step)
+    while math.ceil((end - start) / step) > max_points:
+        step = timeseries_step(bucket, start, end, max_points)
+        start = truncate_local(start, step)
+    return start, step
+
+def timeseries_source(event_id: int, metric: TimeSeriesMetric, step: timedelta, utc_start: datetime, utc_end: datetime):
+    """(instante, valor) de cada linha que entra na série.
+
+    Com passo múltiplo de uma hora lê os agregados (O(horas)); só séries
+    curtas por minuto descem até a tabela de vendas.
+    """
+    if step % ROLLUP_STEP == timedelta(0):
+        Rollup = sales_rollup_model.SalesRollup
+        column = {
+            TimeSeriesMetric.SALES: Rollup.paid_count,
+            TimeSeriesMetric.REVENUE: Rollup.revenue,
+            TimeSeriesMetric.CANCELED: Rollup.canceled_count,
+            TimeSeriesMetric.CHECK_INS: Rollup.checked_in_count,
+        }[metric]
+        return select(Rollup.bucket.label("at"), column.label("value")).where(
+            Rollup.event_id == event_id,
+            Rollup.bucket >= utc_start,
+            Rollup.bucket < utc_end
+        ).subquery("source")
+
+    Sale = sale_model.Sale
+    at, value, condition = {
+        TimeSeriesMetric.SALES: (Sale.created_at, literal(1), Sale.status == SaleStatus.PAID),
+        TimeSeriesMetric.REVENUE: (Sale.created_at, Sale.sale_price, Sale.status == SaleStatus.PAID),
+        TimeSeriesMetric.CANCELED: (Sale.created_at, literal(1), Sale.status == SaleStatus.CANCELED),
+        TimeSeriesMetric.CHECK_INS: (Sale.checked_at, literal(1), Sale.checked_at.isnot(None)),
+    }[metric]
+    return select(at.label("at"), value.label("value")).join(Sale.product).where(
+        product_model.Product.event_id == event_id,
+        condition,
+        at >= utc_start,
+        at < utc_end
+    ).subquery("source")
+
+def get_timeseries(
+    db: Session,
+    event_id: int,
+    metric: TimeSeriesMetric,
+    bucket: TimeSeriesBucket,
+    start: datetime,
+    end: datetime,
+    max_points: int
+) -> dashboard_schema.TimeSeries:
+    """Série temporal agregada no Postgres, com os buckets vazios preenchidos (generate_series).
+
+    Cada linha vai para o índice do seu bucket no relógio local do evento
+    (dias começam à meia-noite local), o banco agrupa por índice e a série
+    de índices completa os buckets sem dado — a resposta tem no máximo
+    max_points pontos.
+    Permissão: verificada pelas rotas (permission_utils).
+    """
+    start, end = to_event_local(start), to_event_local(end)
+    start, step = timeseries_window(bucket, start, end, max_points)
+    points = max(1, math.ceil((end - start) / step))
+
+    source = timeseries_source(event_id, metric, step, local_to_utc(start), local_to_utc(start + step * points))
+    local_at = func.timezone(settings.EVENT_TIMEZONE, func.timezone("UTC", source.c.at))
+    indexed = select(
+        cast(func.floor(func.extract("epoch", local_at - start) / step.total_seconds()), Integer).label("bucket_index"),
+        source.c.value
+    ).subquery("indexed")
+    totals = select(indexed.c.bucket_index, func.sum(indexed.c.value).label("value")).group_by(indexed.c.bucket_index).subquery("totals")
+
+    series = func.generate_series(0, points - 1).table_valued("bucket_index").render_derived(name="series")
+    rows = db.execute(
+        select(series.c.bucket_index, func.coalesce(totals.c.value, 0).label("value"))
+        .select_from(series.outerjoin(totals, totals.c.bucket_index == series.c.bucket_index))
+        .order_by(series.c.bucket_index)
+    ).all()
+
+    return dashboard_schema.TimeSeries(
+        event_id=event_id,
+        metric=metric,
+        bucket=bucket,
+        step_seconds=int(step.total_seconds()),
+        start=start.replace(tzinfo=EVENT_TZ),
+        end=(start + step * points).replace(tzinfo=EVENT_TZ),
+        points=[
+            dashboard_schema.TimeSeriesPoint(timestamp=(start + step * row.bucket_index).replace(tzinfo=EVENT_TZ), value=float(row.value))
+            for row in rows
+        ]
+    )
+
+def get_products_statistics(
+    db: Session,
+    event_id: int,
+    order_by: str = "sales",
+    limit: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> List[dashboard_schema.ProductSalesStats]:
+    """Ranking dos produtos do evento numa única consulta agrupada sobre os agregados.
+
+    Receita pelo preço da venda; os percentuais usam funções de janela
+    sobre todos os produtos do evento, então continuam certos com `limit`.
+    Sem datas, considera todas as vendas; datas no fuso do evento, inclusivas.
+    Permissão: verificada pelas rotas (permission_utils).
+    """
+    Rollup = sales_rollup_model.SalesRollup
+    Product = product_model.Product
+    filters = [Rollup.event_id == event_id]
+    if start_date is not None:
+        filters.append(Rollup.bucket >= local_day_start(start_date))
+    if end_date is not None:
+        filters.append(Rollup.bucket < local_day_start(end_date + timedelta(days=1)))
+    totals = select(
+        Rollup.product_id,
+        func.sum(Rollup.paid_count).label("total_sales"),
+        func.sum(Rollup.revenue).label("total_revenue")
+    ).where(*filters).group_by(Rollup.product_id).subquery("totals")
+
+    total_sales = func.coalesce(totals.c.total_sales, 0)
+    total_revenue = func.coalesce(totals.c.total_revenue, 0)
+    query = select(
+        Product.id,
+        Product.name,
+        Product.stock,
+        total_sales.label("total_sales"),
+        total_revenue.label("total_revenue"),
+        func.sum(total_sales).over().label("event_sales"),
+        func.sum(total_revenue).over().label("event_revenue")
+    ).outerjoin(totals, totals.c.product_id == Product.id).where(
+        Product.event_id == event_id
+    ).order_by(desc(total_revenue if order_by == "revenue" else total_sales), Product.id)
+    if limit:
+        query = query.limit(limit)
+
+    products_stats = []
+    for row in db.execute(query):
+        sales, revenue = int(row.total_sales), float(row.total_revenue)
+        event_sales, event_revenue = int(row.event_sales or 0), float(row.event_revenue or 0)
+        products_stats.append(dashboard_schema.ProductSalesStats(
+            product_id=row.id,
+            product_name=row.name,
+            total_sales=sales,
+            total_revenue=revenue,
+            average_ticket=revenue / sales if sales > 0 else 0.0,
+            percentage_of_sales=round(sales / event_sales * 100, 2) if event_sales else 0.0,
+            percentage_of_revenue=round(revenue / event_revenue * 100, 2) if event_revenue else 0.0,
+            stock_remaining=row.stock,
+            stock_sold=sales if row.stock is not None else None
+        ))
+
+    return products_stats
+
+def seller_totals(db: Session, event_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Totais por vendedor e produto numa consulta agrupada sobre os agregados.
+
+    Devolve (vendedores, vendas do evento, receita do evento). Cada vendedor
+    traz seller_key, username, total_sales, total_revenue e products
+    ({product_id: vendas}); os totais do evento incluem as vendas pelo site e
+    saem de funções de janela na mesma consulta.
+    """
+    Rollup = sales_rollup_model.SalesRollup
+    User = user_model.User
+    filters = [Rollup.event_id == event_id]
+    if start is not None:
+        filters.append(Rollup.bucket >= start)
+    if end is not None:
+        filters.append(Rollup.bucket < end)
+
+    sales = func.sum(Rollup.paid_count)
+    revenue = func.sum(Rollup.revenue)
+    rows = db.execute(
+        select(
+            Rollup.seller_key,
+            Rollup.product_id,
+            User.username,
+            sales.label("sales"),
+            revenue.label("revenue"),
+            func.sum(sales).over().label("event_sales"),
+            func.sum(revenue).over().label("event_revenue")
+        ).outerjoin(User, User.id == Rollup.seller_key).where(*filters).group_by(Rollup.seller_key, Rollup.product_id, User.username)
+    ).all()
+
+    sellers: dict[int, SimpleNamespace] = {}
+    for row in rows:
+        # seller_key 0 = vendas pelo site; vendedor removido fica sem username
+        if row.seller_key == 0 or row.username is None:
+            continue
+        seller = sellers.get(row.seller_key)
+        if seller is None:
+            seller = sellers[row.seller_key] = SimpleNamespace(seller_key=row.seller_key, username=row.username, total_sales=0, total_revenue=0.0, products={})
+        seller.total_sales += int(row.sales or 0)
+        seller.total_revenue += float(row.revenue or 0)
+        if row.sales:
+            seller.products[row.product_id] = int(row.sales)
+
+    event_sales = int(rows[0].event_sales or 0) if rows else 0
+    event_revenue = float(rows[0].event_revenue or 0) if rows else 0.0
+    return list(sellers.values()), event_sales, event_revenue
+
+def build_seller_stats(
+    seller_id: int,
+    seller_name: str,
+    total_sales: int,
+    total_revenue: float,
+    products: int,
+    event_sales: int,
+    event_revenue: float
+) -> dashboard_schema.SallerStats:
+    return dashboard_schema.SallerStats(
+        seller_id=seller_id,
+        seller_name=seller_name,
+        total_sales=total_sales,
+        total_revenue=total_revenue,
+        average_ticket=total_revenue / total_sales if total_sales > 0 else 0.0,
+        percentage_of_sales=round(total_sales / event_sales * 100, 2) if event_sales else 0.0,
+        percentage_of_revenue=round(total_revenue / event_revenue * 100, 2) if event_revenue else 0.0,
+        sales_by_product=products
+    )
+
 def get_sellers_statistics(
     db: Session,
     event_id: int,
-    start_date: date,
-    end_date: date,
-    current_user: user_model.User,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
     seller_id: Optional[int] = None
-):
-    event = db.query(event_model.Event).filter(event_model.Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event Not Found")
-    
-    if current_user.role != "admin" and current_user not in event.administrators:
-        raise HTTPException(status_code=403, detail="Operation not permitted")
-
-    query = db.query(
-        user_model.User.id.label("seller_id"),
-        user_model.User.name.label("seller_name"),
-        func.count(sale_model.Sale.id).label("total_sales"),
-        func.coalesce(func.sum(product_model.Product.price), 0).label("total_revenue"),
-        func.coalesce(func.sum(
-            case([(sale_model.Sale.status == SaleStatus.CANCELED, product_model.Product.price)], else_=0)
-        ), 0).label("total_canceled")
-    ).join(sale_model.Sale, sale_model.Sale.seller_id == user_model.User.id
-    ).join(product_model.Product, sale_model.Sale.product_id == product_model.Product.id
-    ).filter(
-        product_model.Product.event_id == event_id,
-        sale_model.Sale.created_at >= start_date,
-        sale_model.Sale.created_at <= end_date
-    ).group_by(user_model.User.id)
-
-    if seller_id:
-        query = query.filter(user_model.User.id == seller_id)
-
-    sellers_stats = []
-    for row in query.all():
-        cancellation_rate = (row.total_canceled / (row.total_sales + row.total_canceled) * 100) if (row.total_sales + row.total_canceled) > 0 else 0.0
-        sellers_stats.append(dashboard_schema.SallerStats(
-            seller_id=row.seller_id,
-            seller_name=row.seller_name,
-            total_sales=row.total_sales,
-            total_revenue=row.total_revenue,
-            total_canceled=row.total_canceled,
-            cancellation_rate=cancellation_rate
-        ))
+) -> List[dashboard_schema.SallerStats]:
+    # Permissão: verificada pelas rotas (permission_utils); datas no fuso do evento, inclusivas
+    sellers, event_sales, event_revenue = seller_totals(
+        db,
+        event_id,
+        local_day_start(start_date) if start_date else None,
+        local_day_start(end_date + timedelta(days=1)) if end_date else None
+    )
+
+    sellers_stats = [
+        build_seller_stats(row.seller_key, row.username, row.total_sales, row.total_revenue, len(row.products), event_sales, event_revenue)
+        for row in sellers
+        if seller_id is None or row.seller_key == seller_id
+    ]
+    sellers_stats.sort(key=lambda stats: (-stats.total_sales, -stats.total_revenue, stats.seller_id))
+    return sellers_stats
+
+def get_events_summary(db: Session, user_id: int) -> List[dashboard_schema.EventSummary]:
+    """Resumo de todos os eventos que o usuário administra, numa única consulta.
+
+    A permissão é o próprio JOIN com event_administrators; produtos, comissários
+    e os totais dos agregados vêm de subconsultas agrupadas por evento, todas
+    restritas aos eventos do usuário. O número de consultas não depende da
+    quantidade de eventos.
+    """
+    Event = event_model.Event
+    Product = product_model.Product
+    Rollup = sales_rollup_model.SalesRollup
+    Commissioner = commissioner_event.CommissionerEvent
+    admins = event_administrators_table
+    administered = select(admins.c.event_id).where(admins.c.user_id == user_id)
+
+    products = select(Product.event_id, func.count(Product.id).label("total_products"))\
+        .where(Product.event_id.in_(administered)).group_by(Product.event_id).subquery()
+    sellers = select(Commissioner.event_id, func.count(Commissioner.user_id).label("total_sellers"))\
+        .where(Commissioner.event_id.in_(administered)).group_by(Commissioner.event_id).subquery()
+    sales = select(
+        Rollup.event_id,
+        func.sum(Rollup.paid_count).label("total_sales"),
+        func.sum(Rollup.revenue).label("total_revenue"),
+        func.max(Rollup.last_sale_at).label("last_sale_date"),
+        func.max(Rollup.last_canceled_at).label("last_cancellation_date")
+    ).where(Rollup.event_id.in_(administered)).group_by(Rollup.event_id).subquery()
+
+    rows = db.execute(
+        select(
+            Event.id,
+            Event.name,
+            Event.status,
+            Event.event_date,
+            Event.created,
+            Event.image_url,
+            func.coalesce(products.c.total_products, 0).label("total_products"),
+            func.coalesce(sellers.c.total_sellers, 0).label("total_sellers"),
+            func.coalesce(sales.c.total_sales, 0).label("total_sales"),
+            func.coalesce(sales.c.total_revenue, 0).label("total_revenue"),
+            sales.c.last_sale_date,
+            sales.c.last_cancellation_date
+        )
+        .join(admins, and_(admins.c.event_id == Event.id, admins.c.user_id == user_id))
+        .outerjoin(products, products.c.event_id == Event.id)
+        .outerjoin(sellers, sellers.c.event_id == Event.id)
+        .outerjoin(sales, sales.c.event_id == Event.id)
+        .order_by(desc(Event.created), Event.id)
+    ).all()
 
-    return sellers_stats
\ No newline at end of file
+    return [
+        dashboard_schema.EventSummary(
+            event_id=row.id,
+            event_name=row.name,
+            event_status=row.status,
+            event_date=row.event_date,
+            created=row.created,
+            image_url=row.image_url,
+            total_products=row.total_products,
+            total_sellers=row.total_sellers,
+            total_sales=int(row.total_sales),
+            total_revenue=float(row.total_revenue),
+            average_ticket=float(row.total_revenue) / row.total_sales if row.total_sales > 0 else 0.0,
+            last_sale_date=row.last_sale_date,
+            last_cancellation_date=row.last_cancellation_date
+        )
+        for row in rows
+    ]
@@ -0,0 +1,165 @@
+import asyncio
+import json
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import SessionLocal
+from enums import SaleStatus
+from models import product_model, sale_model
+
+
+class DoorState:
+    """Números da portaria de um evento: ingressos, entradas, últimas leituras e entradas por minuto."""
+
+    def __init__(self, total: int, checked_in: int, recent: list[dict], minutes: dict[datetime, int]):
+        self.total = total
+        self.checked_in = checked_in
+        self.recent = deque(recent, maxlen=settings.DOOR_MONITOR_RECENT_SCANS)
+        self.minutes = minutes
+
+    def apply(self, scans: list[dict]):
+        for scan in scans:
+            self.checked_in += 1
+            self.recent.appendleft(scan)
+            minute = scan["checked_at"].replace(second=0, microsecond=0)
+            self.minutes[minute] = self.minutes.get(minute, 0) + 1
+
+    def snapshot(self, event_id: int) -> str:
+        now = datetime.utcnow().replace(second=0, microsecond=0)
+        window = [now - timedelta(minutes=offset) for offset in range(settings.DOOR_MONITOR_WINDOW_MINUTES - 1, -1, -1)]
+        # Descarta os minutos que saíram da janela
+        self.minutes = {minute: count for minute, count in self.minutes.items() if minute >= window[0]}
+        return json.dumps({
+            "event_id": event_id,
+            "total": self.total,
+            "checked_in": self.checked_in,
+            "recent": list(self.recent),
+            "entries_per_minute": [{"minute": minute, "count": self.minutes.get(minute, 0)} for minute in window],
+        }, default=lambda value: value.isoformat())
+
+
+def load_door_state(db: Session, event_id: int) -> DoorState:
+    totals = db.query(
+        func.coalesce(func.sum(case((sale_model.Sale.status == SaleStatus.PAID, 1), else_=0)), 0),
+        func.count(sale_model.Sale.checked_at)
+    ).join(sale_model.Sale.product).filter(product_model.Product.event_id == event_id).one()
+
+    recent = db.query(sale_model.Sale.buyer_name, product_model.Product.name, sale_model.Sale.checked_at)\
+        .join(sale_model.Sale.product)\
+        .filter(product_model.Product.event_id == event_id, sale_model.Sale.checked_at.isnot(None))\
+        .order_by(sale_model.Sale.checked_at.desc())\
+        .limit(settings.DOOR_MONITOR_RECENT_SCANS)\
+        .all()
+
+    since = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(minutes=settings.DOOR_MONITOR_WINDOW_MINUTES)
+    checked_at = db.query(sale_model.Sale.checked_at)\
+        .join(sale_model.Sale.product)\
+        .filter(product_model.Product.event_id == event_id, sale_model.Sale.checked_at >= since)\
+        .all()
+    minutes: dict[datetime, int] = {}
+    for (value,) in checked_at:
+        minute = value.replace(second=0, microsecond=0)
+        minutes[minute] = minutes.get(minute, 0) + 1
+
+    return DoorState(
+        total=totals[0],
+        checked_in=totals[1],
+        recent=[{"buyer_name": row.buyer_name, "product_name": row.name, "checked_at": row.checked_at} for row in recent],
+        minutes=minutes,
+    )
+
+
+def _load_door_state(event_id: int) -> DoorState:
+    with SessionLocal() as db:
+        return load_door_state(db, event_id)
+
+
+class DoorMonitor:
+    """Pub/sub em processo para as telas da portaria.
+
+    Os check-ins publicam aqui (de qualquer thread); o estado de cada evento é
+    mantido em memória e cada tela assinante recebe o snapshot mais recente.
+    O banco só é consultado ao abrir o primeiro stream de um evento e a cada
+    DOOR_MONITOR_RESYNC_SECONDS, que também traz as entradas feitas em outros
+    workers — o custo não cresce com o número de telas.
+    """
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+        self._states: dict[int, DoorState] = {}
+        self._resync_task: asyncio.Task | None = None
+
+    def publish(self, event_id: int, scans: list[dict]):
+        """Chamado pelos check-ins; thread-safe e sem custo quando ninguém assiste o evento."""
+        if not scans or self._loop is None or event_id not in self._subscribers:
+            return
+        self._loop.call_soon_threadsafe(self._apply, event_id, scans)
+
+    async def subscribe(self, event_id: int) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if event_id not in self._states:
+            self._states[event_id] = await run_in_threadpool(_load_door_state, event_id)
+        self._subscribers.setdefault(event_id, set()).add(queue)
+        self._offer(queue, self._states[event_id].snapshot(event_id))
+
+        if self._resync_task is None or self._resync_task.done():
+            self._resync_task = asyncio.create_task(self._resync())
+        return queue
+
+    def unsubscribe(self, event_id: int, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(event_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[event_id]
+            self._states.pop(event_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "events": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+        }
+
+    def _apply(self, event_id: int, scans: list[dict]):
+        state = self._states.get(event_id)
+        if state is None:
+            return
+        state.apply(scans)
+        self._broadcast(event_id)
+
+    def _broadcast(self, event_id: int):
+        state = self._states.get(event_id)
+        if state is None:
+            return
+        message = state.snapshot(event_id)
+        for queue in self._subscribers.get(event_id, ()):
+            self._offer(queue, message)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, message: str):
+        # Tela lenta recebe só o snapshot mais recente
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    async def _resync(self):
+        while self._subscribers:
+            await asyncio.sleep(settings.DOOR_MONITOR_RESYNC_SECONDS)
+            for event_id in list(self._subscribers):
+                try:
+                    state = await run_in_threadpool(_load_door_state, event_id)
+                except Exception as e:
+                    print(f"❌ Falha ao atualizar o monitor da portaria do evento {event_id}: {e}")
+                    continue
+                if event_id in self._subscribers:
+                    self._states[event_id] = state
+                    self._broadcast(event_id)
+
+
+door_monitor = DoorMonitor()
@@ -0,0 +1,110 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from config import settings
+from models import idempotency_key_model, sale_model
+from schemas import sale_schema
+from .cache_utils import TTLCache
+from .sale_utils import create_sale
+
+IdempotencyKey = idempotency_key_model.IdempotencyKey
+KEY_CONSTRAINT = "uq_idempotency_keys_user_id_key"
+
+# (user_id, key) -> (fingerprint, sale_id); só guarda requisições já concluídas
+idempotency_cache = TTLCache(maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_TTL_SECONDS)
+
+
+def request_fingerprint(sale: sale_schema.SaleCreate, seller_id: int | None) -> str:
+    payload = json.dumps(
+        {"sale": sale.model_dump(mode="json"), "seller_id": seller_id},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _check_fingerprint(stored: str, fingerprint: str):
+    if stored != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key already used with a different request"
+        )
+
+
+def is_key_conflict(error: IntegrityError) -> bool:
+    """True só para a violação do índice único de (user_id, key)."""
+    diag = getattr(error.orig, "diag", None)
+    if diag is not None and diag.constraint_name is not None:
+        # psycopg2
+        return diag.constraint_name == KEY_CONSTRAINT
+    # asyncpg e Postgres citam a constraint na mensagem; o sqlite cita as colunas
+    message = str(error.orig)
+    return KEY_CONSTRAINT in message or "idempotency_keys.user_id, idempotency_keys.key" in message
+
+
+def find_replay(db: Session, user_id: int, key: str, fingerprint: str) -> sale_model.Sale | None:
+    cached = idempotency_cache.get((user_id, key))
+    if cached is not None:
+        _check_fingerprint(cached[0], fingerprint)
+        return db.get(sale_model.Sale, cached[1])
+
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+    stored = db.query(IdempotencyKey.fingerprint, IdempotencyKey.sale_id).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.created_at >= cutoff
+    ).first()
+    if stored is None or stored.sale_id is None:
+        return None
+
+    _check_fingerprint(stored.fingerprint, fingerprint)
+    idempotency_cache.set((user_id, key), (stored.fingerprint, stored.sale_id))
+    return db.get(sale_model.Sale, stored.sale_id)
+
+
+def create_sale_idempotent(
+    db: Session,
+    sale: sale_schema.SaleCreate,
+    user_id: int,
+    key: str | None,
+    seller_id: int | None = None,
+    after_commit: list | None = None
+) -> sale_model.Sale:
+    """create_sale com suporte ao header Idempotency-Key.
+
+    Replays são respondidos a partir do cache/índice sem executar create_sale.
+    Requisições duplicadas concorrentes esbarram no índice único de
+    (user_id, key): a segunda espera a primeira terminar e devolve a mesma venda.
+    """
+    if not key:
+        return create_sale(db=db, sale=sale, seller_id=seller_id, after_commit=after_commit)
+
+    fingerprint = request_fingerprint(sale, seller_id)
+    replay = find_replay(db, user_id, key, fingerprint)
+    if replay is not None:
+        return replay
+
+    # Chave expirada pode ser reaproveitada
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.created_at < cutoff
+    ).delete(synchronize_session=False)
+
+    entry = IdempotencyKey(user_id=user_id, key=key, fingerprint=fingerprint)
+    try:
+        new_sale = create_sale(db=db, sale=sale, seller_id=seller_id, idempotency_key=entry, after_commit=after_commit)
+    except IntegrityError as error:
+        db.rollback()
+        if not is_key_conflict(error):
+            raise
+        replay = find_replay(db, user_id, key, fingerprint)
+        if replay is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+        return replay
+
+    idempotency_cache.set((user_id, key), (fingerprint, new_sale.id))
+    return new_sale
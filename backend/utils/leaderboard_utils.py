@@ -0,0 +1,171 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from config import settings
+from schemas import dashboard_schema
+from .dashboard_utils import build_seller_stats, seller_totals
+
+
+class SellerRanking:
+    """Ranking dos vendedores de um evento, sempre ordenado (vendas, receita, id).
+
+    Cada venda ou cancelamento reposiciona só o vendedor afetado (busca
+    binária); ler o top-K é uma fatia da lista, O(K).
+    """
+
+    def __init__(self, rows, event_sales: int, event_revenue: float, loaded_at: float | None = None):
+        self.event_sales = event_sales
+        self.event_revenue = event_revenue
+        # seller_id -> [nome, vendas, receita, {produto: vendas}]
+        self.sellers: dict[int, list] = {}
+        self.order: list[tuple] = []
+        # Início da consulta: vendas commitadas antes disso já estão nos totais
+        self.loaded_at = time.monotonic() if loaded_at is None else loaded_at
+        for row in rows:
+            self.sellers[row.seller_key] = [row.username, row.total_sales, row.total_revenue, row.products]
+        self.order = sorted(self._key(seller_id) for seller_id in self.sellers)
+
+    def _key(self, seller_id: int) -> tuple:
+        _, sales, revenue, _ = self.sellers[seller_id]
+        return (-sales, -revenue, seller_id)
+
+    def apply(self, seller_id: int | None, product_id: int, sales: int, revenue: float) -> bool:
+        """Aplica um delta; False quando o vendedor ainda não está no ranking (precisa recarregar)."""
+        if seller_id is not None and seller_id not in self.sellers:
+            return False
+        self.event_sales += sales
+        self.event_revenue += revenue
+        if seller_id is None:
+            return True
+
+        self.order.pop(bisect_left(self.order, self._key(seller_id)))
+        seller = self.sellers[seller_id]
+        seller[1] += sales
+        seller[2] += revenue
+        products = seller[3]
+        products[product_id] = products.get(product_id, 0) + sales
+        if products[product_id] <= 0:
+            del products[product_id]
+        insort(self.order, self._key(seller_id))
+        return True
+
+    def top(self, limit: int) -> list[dashboard_schema.SallerStats]:
+        result = []
+        for _, _, seller_id in self.order[:limit]:
+            name, sales, revenue, products = self.sellers[seller_id]
+            result.append(build_seller_stats(seller_id, name, sales, revenue, len(products), self.event_sales, self.event_revenue))
+        return result
+
+
+def load_seller_ranking(db: Session, event_id: int) -> SellerRanking:
+    loaded_at = time.monotonic()
+    sellers, event_sales, event_revenue = seller_totals(db, event_id)
+    return SellerRanking(sellers, event_sales, event_revenue, loaded_at)
+
+
+class SellerLeaderboard:
+    """Top-K de vendedores por evento, mantido em memória em cada worker.
+
+    O ranking é carregado do banco (uma consulta agrupada nos agregados) na
+    primeira leitura do evento e a cada `resync_seconds`, que também traz as
+    vendas feitas em outros workers. Entre uma carga e outra, as vendas e
+    cancelamentos deste worker são aplicados depois do commit, então a tela de
+    ranking lê o top-K sem consultar o banco.
+
+    Cada delta traz o instante (time.monotonic) logo depois do commit. Os
+    commitados antes do início da carga já estão nos totais carregados e são
+    ignorados; os que chegam durante a carga ficam guardados e são aplicados ao
+    ranking novo quando ele é publicado.
+    """
+
+    def __init__(self, max_events: int, resync_seconds: float):
+        self.max_events = max_events
+        self.resync_seconds = resync_seconds
+        self._events: OrderedDict[int, SellerRanking] = OrderedDict()
+        # event_id -> deltas recebidos durante cada carga em andamento
+        self._loading: dict[int, list[list]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.updates = 0
+
+    def top(self, db: Session, event_id: int, limit: int) -> list[dashboard_schema.SallerStats]:
+        with self._lock:
+            ranking = self._events.get(event_id)
+            if ranking is not None and time.monotonic() - ranking.loaded_at < self.resync_seconds:
+                self._events.move_to_end(event_id)
+                self.hits += 1
+                return ranking.top(limit)
+
+            pending = []
+            self._loading.setdefault(event_id, []).append(pending)
+
+        # Carga fora do lock: a consulta não segura os outros eventos
+        try:
+            ranking = load_seller_ranking(db, event_id)
+        finally:
+            with self._lock:
+                self._loading[event_id].remove(pending)
+                if not self._loading[event_id]:
+                    del self._loading[event_id]
+
+        with self._lock:
+            self.loads += 1
+            complete = all(
+                ranking.apply(seller_id, product_id, sales, revenue)
+                for committed_at, seller_id, product_id, sales, revenue in pending
+                if committed_at > ranking.loaded_at
+            )
+            if complete:
+                self._events[event_id] = ranking
+                self._events.move_to_end(event_id)
+                while len(self._events) > self.max_events:
+                    self._events.popitem(last=False)
+            return ranking.top(limit)
+
+    def record_sale(self, event_id: int, seller_id: int | None, product_id: int, price: float, committed_at: float):
+        self._apply(event_id, seller_id, product_id, 1, price, committed_at)
+
+    def record_cancellation(self, event_id: int, seller_id: int | None, product_id: int, price: float, committed_at: float):
+        self._apply(event_id, seller_id, product_id, -1, -price, committed_at)
+
+    def invalidate(self, event_id: int | None = None):
+        with self._lock:
+            if event_id is None:
+                self._events.clear()
+            else:
+                self._events.pop(event_id, None)
+
+    def _apply(self, event_id: int, seller_id: int | None, product_id: int, sales: int, revenue: float, committed_at: float):
+        """Chamado depois do commit; sem custo quando o evento não está em memória."""
+        with self._lock:
+            for pending in self._loading.get(event_id, ()):
+                pending.append([committed_at, seller_id, product_id, sales, revenue])
+            ranking = self._events.get(event_id)
+            if ranking is None or committed_at <= ranking.loaded_at:
+                return
+            if ranking.apply(seller_id, product_id, sales, revenue):
+                self.updates += 1
+            else:
+                # Vendedor novo no evento: a próxima leitura recarrega do banco
+                del self._events[event_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            events = len(self._events)
+            sellers = sum(len(ranking.sellers) for ranking in self._events.values())
+        return {
+            "events": events,
+            "sellers": sellers,
+            "hits": self.hits,
+            "loads": self.loads,
+            "updates": self.updates,
+        }
+
+
+seller_leaderboard = SellerLeaderboard(
+    max_events=settings.LEADERBOARD_MAX_EVENTS,
+    resync_seconds=settings.LEADERBOARD_RESYNC_SECONDS,
+)
@@ -0,0 +1,189 @@
+import random
+import threading
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import and_, exists, or_, select, update
+from sqlalchemy.orm import Session
+from config import settings
+from database import SessionLocal
+from enums import EmailOutboxStatus, SaleStatus
+from models import email_outbox_model, sale_model
+from .email_utils import build_ticket_email
+from .smtp_utils import mail_sender
+from .qrcode_utils import qrcode_renderer, sale_qr_payload
+
+Outbox = email_outbox_model.EmailOutbox
+
+
+def enqueue_ticket_email(db: Session, sale: sale_model.Sale) -> email_outbox_model.EmailOutbox:
+    """Registra o envio do ingresso na mesma transação da venda (não faz commit)."""
+    entry = Outbox(sale=sale, status=EmailOutboxStatus.PENDING, next_attempt_at=datetime.utcnow())
+    db.add(entry)
+    return entry
+
+
+def skip_sale_emails(db: Session, sale_id: int):
+    """Tira da fila os emails ainda não entregues de uma venda cancelada (não faz commit)."""
+    db.query(Outbox).filter(
+        Outbox.sale_id == sale_id,
+        Outbox.status.in_((EmailOutboxStatus.PENDING, EmailOutboxStatus.SENDING))
+    ).update({Outbox.status: EmailOutboxStatus.SKIPPED, Outbox.locked_at: None}, synchronize_session=False)
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    delay = min(
+        settings.OUTBOX_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)),
+        settings.OUTBOX_BACKOFF_MAX_SECONDS
+    )
+    # Jitter para os retries de vários workers não baterem no SMTP ao mesmo tempo
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim_batch(db: Session, limit: int) -> list[int]:
+    now = datetime.utcnow()
+    lease_expired = now - timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+
+    claimable = and_(
+        or_(
+            and_(Outbox.status == EmailOutboxStatus.PENDING, Outbox.next_attempt_at <= now),
+            # Entregas que ficaram presas em "sending" (worker morreu no meio)
+            and_(Outbox.status == EmailOutboxStatus.SENDING, Outbox.locked_at < lease_expired)
+        ),
+        # Ingresso de venda cancelada não é enviado
+        ~exists().where(sale_model.Sale.id == Outbox.sale_id, sale_model.Sale.status == SaleStatus.CANCELED)
+    )
+
+    candidates = db.query(Outbox.id).filter(claimable).order_by(
+        Outbox.next_attempt_at
+    ).limit(limit).with_for_update(skip_locked=True).subquery()
+
+    # O UPDATE condicional garante que só um worker fica com cada entrada
+    claimed = db.execute(
+        update(Outbox)
+        .where(Outbox.id.in_(select(candidates.c.id)), claimable)
+        .values(status=EmailOutboxStatus.SENDING, locked_at=now)
+        .returning(Outbox.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+
+    return claimed
+
+
+def mark_sent(entry: email_outbox_model.EmailOutbox):
+    entry.status = EmailOutboxStatus.SENT
+    entry.sent_at = datetime.utcnow()
+    entry.locked_at = None
+    entry.last_error = None
+
+
+def mark_failed(entry: email_outbox_model.EmailOutbox, error: Exception):
+    entry.attempts += 1
+    entry.locked_at = None
+    entry.last_error = f"{type(error).__name__}: {error}"
+
+    if entry.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        entry.status = EmailOutboxStatus.DEAD
+        print(f"☠️ Email da venda {entry.sale_id} movido para dead-letter após {entry.attempts} tentativas")
+    else:
+        entry.status = EmailOutboxStatus.PENDING
+        entry.next_attempt_at = datetime.utcnow() + backoff_delay(entry.attempts)
+
+
+def deliver_entries(db: Session, entry_ids: list[int]) -> int:
+    entries = []
+    for entry in db.query(Outbox).filter(Outbox.id.in_(entry_ids)).all():
+        # Cancelada entre a reserva e a entrega
+        if entry.sale.status == SaleStatus.CANCELED:
+            entry.status = EmailOutboxStatus.SKIPPED
+            entry.locked_at = None
+        else:
+            entries.append(entry)
+
+    # Renderiza os QR codes do lote de uma vez no pool de processos; build_ticket_email usa o cache
+    try:
+        qrcode_renderer.render_batch([sale_qr_payload(entry.sale) for entry in entries])
+    except Exception:
+        # Sem o pré-render, build_ticket_email renderiza cada QR (e falha só a entrada com problema)
+        traceback.print_exc()
+
+    ready, messages = [], []
+    for entry in entries:
+        try:
+            messages.append(build_ticket_email(entry.sale))
+            ready.append(entry)
+        except Exception as e:
+            mark_failed(entry, e)
+
+    # O lote inteiro vai por uma única sessão SMTP do pool
+    try:
+        errors = mail_sender.send_batch(messages)
+    except Exception as e:
+        # Falha do lote inteiro: conta como tentativa de cada entrada em vez de esperar o lease vencer
+        errors = [e] * len(ready)
+
+    delivered = 0
+    for entry, error in zip(ready, errors):
+        if error is None:
+            mark_sent(entry)
+            delivered += 1
+        else:
+            print(f"❌ Falha ao enviar email da venda {entry.sale_id}: {error}")
+            mark_failed(entry, error)
+
+    db.commit()
+    return delivered
+
+
+def process_outbox_batch(session_factory=SessionLocal, limit: int | None = None) -> int:
+    """Reserva e entrega um lote do outbox. Retorna quantas entradas foram reservadas."""
+    with session_factory() as db:
+        entry_ids = claim_batch(db, limit or settings.OUTBOX_BATCH_SIZE)
+        if entry_ids:
+            deliver_entries(db, entry_ids)
+        return len(entry_ids)
+
+
+class OutboxWorkerPool:
+    def __init__(self, workers: int, session_factory=SessionLocal):
+        self.workers = workers
+        self.session_factory = session_factory
+        self._threads: list[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def start(self):
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"outbox-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"📬 {self.workers} workers do outbox de emails iniciados")
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Acorda os workers logo após um commit com novos emails no outbox."""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = process_outbox_batch(self.session_factory)
+            except Exception:
+                traceback.print_exc()
+                claimed = 0
+
+            if claimed == 0:
+                self._wakeup.wait(settings.OUTBOX_POLL_INTERVAL_SECONDS)
+                self._wakeup.clear()
+
+
+outbox_workers = OutboxWorkerPool(settings.OUTBOX_WORKERS)
@@ -1,9 +1,175 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from passlib.hash import bcrypt
+from config import settings
+
+
+def build_password_context(rounds: int) -> CryptContext:
+    # min = max = default: qualquer hash com outro custo é refeito no próximo login
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def calibrate_bcrypt_rounds(target_ms: float, min_rounds: int, max_rounds: int, samples: int = 3) -> int:
+    """Maior custo cujo hash estimado fica dentro de target_ms.
+
+    Mede o custo mínimo (o melhor de `samples`) e extrapola: cada rodada a
+    mais dobra o tempo do bcrypt.
+    """
+    hasher = bcrypt.using(rounds=min_rounds)
+    elapsed = float("inf")
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash("calibration")
+        elapsed = min(elapsed, time.perf_counter() - started)
+
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed * 1000 * 2 ** (rounds + 1 - min_rounds) <= target_ms:
+        rounds += 1
+    return rounds
+
+
+class PasswordHasher:
+    """bcrypt num pool de threads próprio (o bcrypt solta o GIL).
+
+    O threadpool das rotas não fica ocupado com hashes: as rotas async
+    aguardam o resultado sem prender thread nenhuma, e no máximo `workers`
+    hashes rodam ao mesmo tempo. Acima de `max_pending` hashes na fila a
+    requisição recebe 503 em vez de esperar indefinidamente.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = max(workers, 1)
+        self.max_pending = max(max_pending, 1)
+        self.rounds: int | None = None
+        self.calibrated = False
+        self._context: CryptContext | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.hash_ms_total = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._context is None:
+                self._configure()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+
+    def stop(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    async def verify(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """(senha confere, novo hash se o custo guardado difere do atual)."""
+        return await asyncio.wrap_future(self._submit(self._verify_and_update, plain_password, hashed_password))
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(self._hash, password))
+
+    def hash_sync(self, password: str) -> str:
+        """Para rotas síncronas: o CPU fica no pool dedicado, a thread só espera."""
+        return self._submit(self._hash, password).result()
+
+    def verify_sync(self, plain_password: str, hashed_password: str) -> bool:
+        return self._submit(self._verify_and_update, plain_password, hashed_password).result()[0]
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "calibrated": self.calibrated,
+            "pending": self.pending,
+            "running": self.running,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_wait_ms": round(self.wait_ms_total / self.completed, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.wait_ms_max, 2),
+            "avg_hash_ms": round(self.hash_ms_total / self.completed, 2) if self.completed else 0.0,
+        }
+
+    def _configure(self):
+        if settings.PASSWORD_HASH_ROUNDS is not None:
+            self.rounds = settings.PASSWORD_HASH_ROUNDS
+        else:
+            self.rounds = calibrate_bcrypt_rounds(
+                settings.PASSWORD_HASH_TARGET_MS,
+                settings.PASSWORD_HASH_MIN_ROUNDS,
+                settings.PASSWORD_HASH_MAX_ROUNDS,
+            )
+            self.calibrated = True
+        self._context = build_password_context(self.rounds)
+        print(f"🔐 bcrypt com custo {self.rounds} ({'calibrado' if self.calibrated else 'PASSWORD_HASH_ROUNDS'})")
+
+    def _submit(self, fn, *args) -> Future:
+        if self._executor is None:
+            self.start()
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent logins, try again shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        return self._executor.submit(self._run, time.perf_counter(), fn, *args)
+
+    def _run(self, submitted_at: float, fn, *args):
+        started = time.perf_counter()
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.running -= 1
+                self.pending -= 1
+                self.completed += 1
+                wait_ms = (started - submitted_at) * 1000
+                self.wait_ms_total += wait_ms
+                self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+                self.hash_ms_total += (finished - started) * 1000
+
+    def _hash(self, password: str) -> str:
+        return self._context.hash(password)
+
+    def _verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        valid, new_hash = self._context.verify_and_update(plain_password, hashed_password)
+        if new_hash is not None:
+            with self._lock:
+                self.rehashed += 1
+        return valid, new_hash
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify_sync(plain_password, hashed_password)
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return password_hasher.hash_sync(password)
@@ -0,0 +1,106 @@
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+from config import settings
+from dependencies import get_db
+from enums import UserRole
+from models import commissioner_event, event_model, user_model
+from models.association_tables import event_administrators_table
+from .auth_utils import event_role_from_claims, get_current_user
+from .cache_utils import TTLCache
+
+NO_ROLE = ""
+
+# (user_id, event_id) -> "admin" | "commissioner" | NO_ROLE
+event_role_cache = TTLCache(maxsize=settings.PERMISSION_CACHE_SIZE, ttl=settings.PERMISSION_CACHE_TTL_SECONDS)
+
+
+def resolve_event_role(db: Session, user_id: int, event_id: int) -> tuple[bool, str | None]:
+    """(evento existe, papel do usuário no evento) numa única consulta com EXISTS indexados."""
+    admins = event_administrators_table
+    commissioners = commissioner_event.CommissionerEvent.__table__
+    row = db.execute(select(
+        exists().where(event_model.Event.id == event_id).label("event_exists"),
+        exists().where(admins.c.event_id == event_id, admins.c.user_id == user_id).label("is_admin"),
+        exists().where(commissioners.c.event_id == event_id, commissioners.c.user_id == user_id).label("is_commissioner")
+    )).one()
+
+    if row.is_admin:
+        return True, UserRole.ADMIN
+    if row.is_commissioner:
+        return True, UserRole.COMMISSIONER
+    return row.event_exists, None
+
+
+def get_event_role(db: Session, user: user_model.User, event_id: int) -> str | None:
+    """Papel do usuário no evento ("admin", "commissioner" ou None). 404 se o evento não existe."""
+    claimed_role = event_role_from_claims(user, event_id)
+    if claimed_role is not None:
+        return claimed_role
+
+    cached = event_role_cache.get((user.id, event_id))
+    if cached is not None:
+        return cached or None
+
+    event_exists, role = resolve_event_role(db, user.id, event_id)
+    if not event_exists:
+        raise HTTPException(status_code=404, detail="Event Not Found")
+
+    event_role_cache.set((user.id, event_id), role or NO_ROLE)
+    return role
+
+
+def require_event_role(
+    db: Session,
+    user: user_model.User,
+    event_id: int,
+    roles: tuple[str, ...] = (UserRole.ADMIN, UserRole.COMMISSIONER),
+    detail: str = "Operation not permitted: user is not an administrator or commissioner of this event"
+) -> str:
+    role = get_event_role(db, user, event_id)
+    if role not in roles:
+        raise HTTPException(status_code=403, detail=detail)
+    return role
+
+
+def check_admin_account(user: user_model.User, detail: str = "Operation not permitted: only admins can perform this action"):
+    """Papel global da conta (users.role); as mutações de evento/produto exigem admin além do papel no evento."""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail=detail)
+
+
+def invalidate_event_permissions(user_id: int | None = None, event_id: int | None = None):
+    """Chamar ao mudar administradores/comissários de um evento, ou ao remover usuário/evento."""
+    event_role_cache.invalidate_where(lambda key, _: (user_id is None or key[0] == user_id) and (event_id is None or key[1] == event_id))
+
+
+def event_role_required(*roles: str, detail: str | None = None, admin_account: str | None = None):
+    """Dependência FastAPI: exige um dos papéis no evento do path (event_id/id_event) ou da query (event_id).
+
+    Com `admin_account` (mensagem do 403), a conta também precisa ter role "admin",
+    verificado antes do papel no evento. Devolve o usuário autenticado, para ser
+    usada no lugar de get_current_user.
+    """
+    roles = roles or (UserRole.ADMIN, UserRole.COMMISSIONER)
+    if detail is None:
+        detail = "Operation not permitted: only event administrators can perform this action" if roles == (UserRole.ADMIN,) \
+            else "Operation not permitted: user is not an administrator or commissioner of this event"
+
+    def dependency(
+        request: Request,
+        db: Session = Depends(get_db),
+        current_user: user_model.User = Depends(get_current_user)
+    ) -> user_model.User:
+        if admin_account is not None:
+            check_admin_account(current_user, admin_account)
+
+        raw_event_id = request.path_params.get("event_id") or request.path_params.get("id_event") or request.query_params.get("event_id")
+        try:
+            event_id = int(raw_event_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=404, detail="Event Not Found")
+
+        require_event_role(db, current_user, event_id, roles, detail)
+        return current_user
+
+    return dependency
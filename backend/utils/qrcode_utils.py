@@ -1,50 +1,237 @@
 import qrcode
 import io
-import os
-from uuid import uuid4
-from pathlib import Path
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from config import settings
+from .signature_utils import event_key, sign, verify
 
-TEMP_DIR = "temp_qrcodes"
+TICKET_QR_PREFIX = "UF1"
+TICKET_KEY_PURPOSE = "ticket-qr"
+# HMAC-SHA256 truncado em 128 bits (22 chars base64url): mantém o QR pequeno
+TICKET_SIGNATURE_LENGTH = 22
+
+def ticket_qr_payload(event_id: int, unique_code) -> str:
+    """Conteúdo do QR do ingresso: UF1.<event_id>.<uuid hex>.<assinatura>.
+
+    Leitores com a chave do evento validam offline; a API descarta códigos
+    forjados ou de outro evento antes de ir ao banco.
+    """
+    body = f"{event_id}.{uuid.UUID(str(unique_code)).hex}"
+    signature = sign(event_key(event_id, TICKET_KEY_PURPOSE), body.encode(), TICKET_SIGNATURE_LENGTH)
+    return f"{TICKET_QR_PREFIX}.{body}.{signature}"
+
+def sale_qr_payload(sale) -> str:
+    return ticket_qr_payload(sale.product.event_id, sale.unique_code)
+
+def parse_ticket_code(raw: str) -> tuple[int | None, uuid.UUID]:
+    """Valida o código lido e devolve (event_id, unique_code), sem acessar o banco.
+
+    UUID puro (QRs antigos) devolve event_id None. Levanta ValueError para
+    código malformado ou assinatura inválida.
+    """
+    raw = raw.strip()
+    if not raw.startswith(TICKET_QR_PREFIX + "."):
+        if not settings.TICKET_QR_ACCEPT_LEGACY:
+            raise ValueError("legacy ticket codes are disabled")
+        return None, uuid.UUID(raw)
+
+    parts = raw.split(".")
+    if len(parts) != 4 or not parts[1].isdigit() or len(parts[3]) != TICKET_SIGNATURE_LENGTH:
+        raise ValueError("malformed ticket code")
+
+    event_id = int(parts[1])
+    body = f"{parts[1]}.{parts[2]}"
+    if not verify(event_key(event_id, TICKET_KEY_PURPOSE), body.encode(), parts[3], TICKET_SIGNATURE_LENGTH):
+        raise ValueError("invalid ticket signature")
+    return event_id, uuid.UUID(hex=parts[2])
 
 def generate_qrcode_image_in_memory(data: str):
-    
+
     qr = qrcode.QRCode(
-        version=1, 
-        error_correction=qrcode.constants.ERROR_CORRECT_L, 
-        box_size=10, 
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
         border=4
     )
     qr.add_data(data)
     qr.make(fit=True)
     img = qr.make_image(fill_color="black", back_color="white")
-    
+
     buffer = io.BytesIO()
     img.save(buffer, format="PNG")
     buffer.seek(0)
-    
+
     return buffer
 
-def generate_qrcode_image_file(data: str):
-    """Generate QR code and save to file, return file path"""
-    # Ensure temp directory exists
-    temp_dir = Path(TEMP_DIR)
-    temp_dir.mkdir(exist_ok=True)
-    
-    # Generate unique filename
-    filename = f"qr_{uuid4().hex}.png"
-    filepath = temp_dir / filename
-    
-    qr = qrcode.QRCode(
-        version=1, 
-        error_correction=qrcode.constants.ERROR_CORRECT_L, 
-        box_size=10, 
-        border=4
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Save to file
-    img.save(filepath, format="PNG")
-    
-    return str(filepath)
\ No newline at end of file
+def render_qrcode_png(data: str) -> bytes:
+    return generate_qrcode_image_in_memory(data).getvalue()
+
+def render_qrcode_pngs(datas: list[str]) -> list[bytes]:
+    # Executado dentro dos processos do pool de renderização
+    return [render_qrcode_png(data) for data in datas]
+
+
+class QRCodeCache:
+    """LRU de PNGs já renderizados, indexado pelo conteúdo do QR (payload assinado do ingresso)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, payload: str) -> bytes | None:
+        with self._lock:
+            png = self._items.get(payload)
+            if png is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(payload)
+            self.hits += 1
+            return png
+
+    def put(self, payload: str, png: bytes):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[payload] = png
+            self._items.move_to_end(payload)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+qrcode_cache = QRCodeCache(settings.QRCODE_CACHE_SIZE)
+
+
+class QRCodeRenderService:
+    """Renderiza QR codes em lotes num pool de processos, fora do GIL das threads da API.
+
+    No máximo `max_pending` lotes ficam em voo: render_batch espera uma vaga
+    (backpressure) e prefetch simplesmente desiste quando o pool está cheio.
+    Com workers=0 renderiza na própria thread.
+    """
+
+    def __init__(self, workers: int, max_pending: int, chunk_size: int):
+        self.workers = workers
+        self.chunk_size = max(chunk_size, 1)
+        self.max_pending = max(max_pending, 1)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        # Contadores: atualizados pelas threads da API e pelos callbacks do pool
+        self._stats_lock = threading.Lock()
+        self.pending = 0
+        self.rendered = 0
+        self.rejected_prefetch = 0
+
+    def start(self):
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                # spawn: não herda as threads (SMTP, outbox) do processo da API
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+
+    def stop(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def render_batch(self, payloads: list[str]) -> dict[str, bytes]:
+        result: dict[str, bytes] = {}
+        missing: list[str] = []
+        for code in dict.fromkeys(payloads):
+            png = qrcode_cache.get(code)
+            if png is None:
+                missing.append(code)
+            else:
+                result[code] = png
+
+        futures = []
+        for chunk in self._chunks(missing):
+            self._slots.acquire()
+            futures.append((chunk, self._submit(chunk)))
+
+        for chunk, future in futures:
+            for code, png in zip(chunk, future.result()):
+                result[code] = png
+        return result
+
+    def prefetch(self, payloads: list[str]):
+        """Agenda a renderização sem bloquear; o resultado só alimenta o cache."""
+        missing = [code for code in payloads if qrcode_cache.get(code) is None]
+        for chunk in self._chunks(missing):
+            if not self._slots.acquire(blocking=False):
+                with self._stats_lock:
+                    self.rejected_prefetch += 1
+                return
+            self._submit(chunk)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "pending_batches": self.pending,
+                "max_pending_batches": self.max_pending,
+                "rendered": self.rendered,
+                "rejected_prefetch": self.rejected_prefetch,
+            }
+
+    def _chunks(self, codes: list[str]):
+        for index in range(0, len(codes), self.chunk_size):
+            yield codes[index:index + self.chunk_size]
+
+    def _submit(self, chunk: list[str]) -> Future:
+        with self._stats_lock:
+            self.pending += 1
+        try:
+            if self.workers > 0:
+                self.start()
+                future = self._executor.submit(render_qrcode_pngs, chunk)
+            else:
+                future = Future()
+                future.set_result(render_qrcode_pngs(chunk))
+        except Exception:
+            with self._stats_lock:
+                self.pending -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda done: self._finish(chunk, done))
+        return future
+
+    def _finish(self, chunk: list[str], future: Future):
+        with self._stats_lock:
+            self.pending -= 1
+        self._slots.release()
+        if future.cancelled() or future.exception() is not None:
+            return
+        for code, png in zip(chunk, future.result()):
+            qrcode_cache.put(code, png)
+        with self._stats_lock:
+            self.rendered += len(chunk)
+
+
+qrcode_renderer = QRCodeRenderService(
+    workers=settings.QRCODE_RENDER_WORKERS,
+    max_pending=settings.QRCODE_RENDER_MAX_PENDING,
+    chunk_size=settings.QRCODE_RENDER_CHUNK_SIZE,
+)
+
+def get_ticket_qrcode_png(payload: str) -> bytes:
+    """PNG do QR code do ingresso, sem tocar o disco; reenvios saem do cache."""
+    return qrcode_renderer.render_batch([payload])[payload]
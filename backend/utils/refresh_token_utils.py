@@ -0,0 +1,98 @@
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from config import settings
+from models import commissioner_event, refresh_token_model, user_model
+from models.association_tables import event_administrators_table
+from schemas import token_schema
+from .auth_utils import create_claims_access_token, credentials_exception, invalidate_principal, revoked_users
+
+RefreshToken = refresh_token_model.RefreshToken
+
+
+def hash_refresh_token(raw: str) -> str:
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def issue_refresh_token(db: Session, user_id: int) -> tuple[str, refresh_token_model.RefreshToken]:
+    raw = secrets.token_urlsafe(32)
+    entry = RefreshToken(
+        user_id=user_id,
+        token_hash=hash_refresh_token(raw),
+        expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    db.add(entry)
+    db.flush()
+    return raw, entry
+
+
+def build_token_response(db: Session, user: user_model.User, refresh_token: str) -> token_schema.Token:
+    """Access token curto com os eventos do usuário lidos agora do banco."""
+    admin_events = [row.event_id for row in db.query(event_administrators_table.c.event_id).filter(event_administrators_table.c.user_id == user.id)]
+    commissioner_events = [row.event_id for row in db.query(commissioner_event.CommissionerEvent.event_id).filter(commissioner_event.CommissionerEvent.user_id == user.id)]
+
+    return token_schema.Token(
+        access_token=create_claims_access_token(user, admin_events, commissioner_events),
+        token_type="bearer",
+        refresh_token=refresh_token,
+        expires_in=settings.CLAIMS_ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
+
+
+def login_with_refresh_token(db: Session, user: user_model.User) -> token_schema.Token:
+    raw, _ = issue_refresh_token(db, user.id)
+    response = build_token_response(db, user, raw)
+    db.commit()
+    return response
+
+
+def rotate_refresh_token(db: Session, raw: str) -> token_schema.Token:
+    """Troca um refresh token por um par novo; o antigo fica revogado.
+
+    Reapresentar um refresh token já trocado indica vazamento: todas as
+    sessões do usuário são revogadas.
+    """
+    entry = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_refresh_token(raw)).with_for_update().first()
+    if entry is None or entry.expires_at <= datetime.utcnow():
+        raise credentials_exception()
+
+    if entry.revoked_at is not None:
+        if entry.replaced_by_id is not None:
+            print(f"⚠️ Refresh token reutilizado pelo usuário {entry.user_id}; revogando todas as sessões")
+            revoke_user_sessions(db, entry.user_id)
+            db.commit()
+        raise credentials_exception()
+
+    user = db.get(user_model.User, entry.user_id)
+    if user is None:
+        raise credentials_exception()
+
+    new_raw, new_entry = issue_refresh_token(db, user.id)
+    entry.revoked_at = datetime.utcnow()
+    entry.replaced_by_id = new_entry.id
+
+    response = build_token_response(db, user, new_raw)
+    db.commit()
+    return response
+
+
+def revoke_refresh_token(db: Session, raw: str):
+    entry = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_refresh_token(raw)).first()
+    if entry is not None and entry.revoked_at is None:
+        entry.revoked_at = datetime.utcnow()
+        db.commit()
+
+
+def revoke_user_sessions(db: Session, user_id: int):
+    """Corta o usuário: revoga os refresh tokens e recusa os access tokens já emitidos (neste worker).
+
+    Nos outros workers os access tokens já emitidos expiram sozinhos em
+    CLAIMS_ACCESS_TOKEN_EXPIRE_MINUTES; nenhum refresh passa mais.
+    """
+    db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({"revoked_at": datetime.utcnow()}, synchronize_session=False)
+    revoked_users.set(user_id, datetime.now(timezone.utc))
+    invalidate_principal(user_id)
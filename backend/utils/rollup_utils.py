@@ -0,0 +1,183 @@
+"""Agregados de vendas por hora (sales_rollups).
+
+Mantidos de forma incremental, na mesma transação de quem cria, cancela ou
+faz check-in de uma venda; os dashboards leem daqui em O(buckets). Cada
+escrita vai para um shard sorteado da chave (ver SalesRollup), então vendas
+simultâneas do mesmo produto raramente esperam umas pelas outras.
+
+Reconstrução (backfill ou correção), para todos os eventos ou um só:
+
+    python -m utils.rollup_utils [--event-id 42]
+"""
+import argparse
+import random
+from datetime import datetime
+from sqlalchemy import case, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from config import settings
+from enums import SaleStatus
+from models import product_model, sale_model, sales_rollup_model
+
+SalesRollup = sales_rollup_model.SalesRollup
+ROLLUP_COUNTERS = ("paid_count", "canceled_count", "revenue", "checked_in_count")
+# Colunas de horário: ficam com o maior valor em vez de somar
+ROLLUP_LATEST = ("last_sale_at", "last_canceled_at")
+REBUILD_CHUNK_SIZE = 5000
+# Linhas por INSERT (11 parâmetros cada; o Postgres aceita até 65535 por statement)
+UPSERT_CHUNK_SIZE = 1000
+
+
+def hour_bucket(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class RollupChanges:
+    """Acumula deltas por (evento, produto, vendedor, hora) e grava com upserts em lote."""
+
+    def __init__(self):
+        self._rows: dict[tuple, dict[str, float]] = {}
+
+    def add(
+        self,
+        event_id: int,
+        product_id: int,
+        seller_id: int | None,
+        at: datetime,
+        last_sale_at: datetime | None = None,
+        last_canceled_at: datetime | None = None,
+        **amounts: float
+    ):
+        key = (event_id, product_id, seller_id or 0, hour_bucket(at))
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = {**dict.fromkeys(ROLLUP_COUNTERS, 0), **dict.fromkeys(ROLLUP_LATEST)}
+        for counter, amount in amounts.items():
+            row[counter] += amount
+        for column, value in (("last_sale_at", last_sale_at), ("last_canceled_at", last_canceled_at)):
+            if value is not None and (row[column] is None or value > row[column]):
+                row[column] = value
+
+    def apply(self, db: Session, shard: int | None = None):
+        """Grava os deltas num shard sorteado (ou no informado).
+
+        Transações concorrentes sobre a mesma chave caem, na maioria das vezes,
+        em sub-linhas diferentes e não esperam o lock uma da outra.
+        """
+        if not self._rows:
+            return
+        if shard is None:
+            shard = random.randrange(settings.ROLLUP_SHARDS)
+        table = SalesRollup.__table__
+        dialect_insert = sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+        # Ordem fixa das chaves: transações concorrentes travam as linhas na mesma ordem
+        values = [
+            {"event_id": key[0], "product_id": key[1], "seller_key": key[2], "bucket": key[3], "shard": shard, **counters}
+            for key, counters in sorted(self._rows.items())
+        ]
+        for index in range(0, len(values), UPSERT_CHUNK_SIZE):
+            statement = dialect_insert(table).values(values[index:index + UPSERT_CHUNK_SIZE])
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.event_id, table.c.product_id, table.c.seller_key, table.c.bucket, table.c.shard],
+                set_={
+                    **{counter: table.c[counter] + statement.excluded[counter] for counter in ROLLUP_COUNTERS},
+                    # Maior dos dois, ignorando NULL (igual no sqlite e no Postgres)
+                    **{
+                        column: case(
+                            (statement.excluded[column].is_(None), table.c[column]),
+                            (table.c[column].is_(None) | (statement.excluded[column] > table.c[column]), statement.excluded[column]),
+                            else_=table.c[column]
+                        )
+                        for column in ROLLUP_LATEST
+                    }
+                }
+            ))
+        self._rows.clear()
+
+
+def record_sale(db: Session, event_id: int, sale: sale_model.Sale):
+    changes = RollupChanges()
+    changes.add(event_id, sale.product_id, sale.seller_id, sale.created_at, last_sale_at=sale.created_at, paid_count=1, revenue=sale.sale_price)
+    changes.apply(db)
+
+
+def record_cancellation(db: Session, event_id: int, sale: sale_model.Sale):
+    changes = RollupChanges()
+    changes.add(
+        event_id, sale.product_id, sale.seller_id, sale.created_at,
+        last_canceled_at=sale.canceled_at, paid_count=-1, canceled_count=1, revenue=-sale.sale_price
+    )
+    changes.apply(db)
+
+
+def record_check_ins(db: Session, event_id: int, rows):
+    """`rows` precisam de product_id, seller_id e new_checked_at (só os marcados agora contam)."""
+    changes = RollupChanges()
+    for row in rows:
+        if row.new_checked_at is not None:
+            changes.add(event_id, row.product_id, row.seller_id, row.new_checked_at, checked_in_count=1)
+    changes.apply(db)
+
+
+def rebuild_rollups(db: Session, event_id: int | None = None):
+    """Recalcula os agregados a partir da tabela de vendas, numa transação.
+
+    No Postgres a tabela de vendas fica travada contra escrita (SHARE) até o
+    commit, para nenhuma venda concorrente ficar de fora ou contar duas vezes.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE sales IN SHARE MODE"))
+
+    deleted = db.query(SalesRollup)
+    if event_id is not None:
+        deleted = deleted.filter(SalesRollup.event_id == event_id)
+    deleted.delete(synchronize_session=False)
+
+    sales = db.query(
+        product_model.Product.event_id,
+        sale_model.Sale.product_id,
+        sale_model.Sale.seller_id,
+        sale_model.Sale.status,
+        sale_model.Sale.sale_price,
+        sale_model.Sale.created_at,
+        sale_model.Sale.canceled_at,
+        sale_model.Sale.checked_at
+    ).join(sale_model.Sale.product)
+    if event_id is not None:
+        sales = sales.filter(product_model.Product.event_id == event_id)
+
+    # Agrupa em memória (O(buckets)) lendo as vendas em streaming
+    changes = RollupChanges()
+    count = 0
+    for sale in sales.yield_per(REBUILD_CHUNK_SIZE):
+        if sale.status == SaleStatus.PAID:
+            changes.add(sale.event_id, sale.product_id, sale.seller_id, sale.created_at, last_sale_at=sale.created_at, paid_count=1, revenue=sale.sale_price)
+        elif sale.status == SaleStatus.CANCELED:
+            changes.add(
+                sale.event_id, sale.product_id, sale.seller_id, sale.created_at,
+                last_sale_at=sale.created_at, last_canceled_at=sale.canceled_at, canceled_count=1
+            )
+        if sale.checked_at is not None:
+            changes.add(sale.event_id, sale.product_id, sale.seller_id, sale.checked_at, checked_in_count=1)
+        count += 1
+
+    # Reconstrução consolida tudo no shard 0
+    changes.apply(db, shard=0)
+    db.commit()
+    return count
+
+
+def main():
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Reconstrói a tabela sales_rollups a partir das vendas")
+    parser.add_argument("--event-id", type=int, default=None, help="reconstrói só este evento")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        count = rebuild_rollups(db, args.event_id)
+    print(f"📊 Agregados reconstruídos a partir de {count} vendas")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,54 @@
+from sqlalchemy import exists, or_, select, update
 from sqlalchemy.orm import Session
+from datetime import datetime
 from fastapi import HTTPException
-from enums import EventStatus
-from models import product_model, sale_model, user_model, event_model
-from schemas import sale_schema
-from .qrcode_utils import generate_qrcode_image_in_memory
-from .email_utils import  formated_email_to_send
+from enums import CheckInOutcome, EventStatus, SaleStatus
+from models import product_model, sale_model, user_model, idempotency_key_model, commissioner_event
+from models.association_tables import event_administrators_table
+from schemas import sale_schema, product_schema
+from .qrcode_utils import parse_ticket_code, qrcode_renderer, ticket_qr_payload
+from .outbox_utils import enqueue_ticket_email, outbox_workers
+from .stock_utils import reserve_stock
+from .checkin_index_utils import checkin_index
+from .door_monitor_utils import door_monitor
+from .rollup_utils import record_check_ins, record_sale
+from .leaderboard_utils import seller_leaderboard
+from .auth_utils import event_role_from_claims
+from .permission_utils import require_event_role
 import os
+import time
+import uuid
+from functools import partial
 
 import locale
 locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
 
-def create_sale(db: Session, sale: sale_schema.SaleCreate, seller_id: int | None = None) -> sale_model.Sale:
+def sale_committed(event_id: int, seller_id: int | None, sale_id: int, product_id: int, sale_price: float, unique_code: uuid.UUID, committed_at: float):
+    """Efeitos depois do commit da venda: ranking em memória, QR no cache e outbox.
+
+    Não toca o banco; as rotas async rodam isto no threadpool, fora do event loop
+    (com QRCODE_RENDER_WORKERS=0 o PNG é renderizado aqui mesmo).
+    """
+    print(f"Venda {sale_id} criada. Email de confirmação enfileirado no outbox.")
+    seller_leaderboard.record_sale(event_id, seller_id, product_id, sale_price, committed_at)
+    # Adianta a renderização do QR code para o worker do outbox já encontrar no cache
+    qrcode_renderer.prefetch([ticket_qr_payload(event_id, unique_code)])
+    outbox_workers.notify()
+
+def create_sale(
+    db: Session,
+    sale: sale_schema.SaleCreate,
+    seller_id: int | None = None,
+    idempotency_key: idempotency_key_model.IdempotencyKey | None = None,
+    after_commit: list | None = None
+) -> sale_model.Sale:
+    """Cria a venda numa transação. Com `after_commit`, os efeitos pós-commit
+    (sale_committed) são adicionados à lista em vez de executados aqui."""
+    if idempotency_key is not None:
+        # Grava a chave antes de tudo: uma requisição duplicada concorrente espera aqui no índice único
+        db.add(idempotency_key)
+        db.flush()
+
     product = db.query(product_model.Product).filter(product_model.Product.id == sale.product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product Not Found")
@@ -18,27 +56,23 @@ def create_sale(db: Session, sale: sale_schema.SaleCreate, seller_id: int | None
     if product.event.status != EventStatus.ACTIVE:
         raise HTTPException(status_code=400, detail="Event is not active")
 
-    if product.stock is not None:
-        if product.stock <= 0:
-            raise HTTPException(status_code=400, detail="Product Out of Stock")
-        product.stock -= 1
-    
+    if product.stock is not None and product.stock <= 0:
+        raise HTTPException(status_code=400, detail="Product Out of Stock")
 
     if seller_id:
         # Verificar se o vendedor é commissioner ou admin do evento
-        seller = db.query(user_model.User).filter(user_model.User.id == seller_id).first()
+        seller = db.get(user_model.User, seller_id)
         if not seller:
             raise HTTPException(status_code=404, detail="Seller Not Found")
         
         # Permitir que tanto commissioners quanto admins façam vendas comissionadas
-        is_commissioner = seller in product.event.commissioners
-        is_admin = seller in product.event.administrators
-        
-        if not (is_commissioner or is_admin):
-            raise HTTPException(status_code=403, detail="User is not authorized to sell for this event")
+        require_event_role(db, seller, product.event_id, detail="User is not authorized to sell for this event")
     else:
         seller = None
-    
+
+    # Baixa de estoque atômica: a checagem acima é só um atalho, quem decide é o UPDATE condicional
+    reserve_stock(db, product)
+
     new_sale = sale_model.Sale(
         product_id = sale.product_id,
         seller_id = seller_id,
@@ -49,25 +83,224 @@ def create_sale(db: Session, sale: sale_schema.SaleCreate, seller_id: int | None
 
     
     db.add(new_sale)
+    if idempotency_key is not None:
+        idempotency_key.sale = new_sale
+    db.flush()
+    record_sale(db, product.event_id, new_sale)
+    # O email vai para o outbox na mesma transação: a venda não espera o SMTP
+    enqueue_ticket_email(db, new_sale)
     db.commit()
+    committed_at = time.monotonic()
     db.refresh(new_sale)
     
-    print(f"Venda {new_sale.id} criada. Gerando QR Code e enviando e-mail...")
-    
-    formated_email_to_send(new_sale)
-
+    effects = partial(sale_committed, product.event_id, seller_id, new_sale.id, new_sale.product_id, new_sale.sale_price, new_sale.unique_code, committed_at)
+    if after_commit is None:
+        effects()
+    else:
+        after_commit.append(effects)
     
     return new_sale
 
-def validate_event_admin_access(db: Session, current_user: user_model.User, id_event: int):
-    event = db.query(event_model.Event).filter(event_model.Event.id == id_event).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event Not Found")
-    
-    if current_user in event.administrators:
-        return "admin"
+def build_check_in_statement(unique_code: uuid.UUID, user_id: int, checked_at: datetime, event_id: int | None = None):
+    """Autorização + transição do check-in numa única ida ao banco (Postgres).
 
-    if current_user in event.commissioners:
-        return "commissioner"
-    
-    raise HTTPException(status_code=403, detail="Operation not permitted: user is not an administrator or commissioner of this event")
\ No newline at end of file
+    O CTE `target` traz a venda, o produto e se o usuário é admin/comissário do
+    evento; o CTE `updated` só marca a venda se ela estiver PAGA, sem check-in e
+    o usuário tiver acesso. O SELECT final devolve tudo para montar a resposta
+    ou o erro certo.
+    """
+    sales = sale_model.Sale.__table__
+    products = product_model.Product.__table__
+    admins = event_administrators_table
+    commissioners = commissioner_event.CommissionerEvent.__table__
+
+    is_admin = exists().where(admins.c.event_id == products.c.event_id, admins.c.user_id == user_id)
+    is_commissioner = exists().where(commissioners.c.event_id == products.c.event_id, commissioners.c.user_id == user_id)
+
+    target = select(
+        sales.c.id,
+        sales.c.seller_id,
+        sales.c.buyer_name,
+        sales.c.buyer_email,
+        sales.c.status,
+        sales.c.sale_date,
+        sales.c.unique_code,
+        sales.c.checked_at,
+        products.c.id.label("product_id"),
+        products.c.name.label("product_name"),
+        products.c.description.label("product_description"),
+        products.c.stock.label("product_stock"),
+        products.c.price.label("product_price"),
+        products.c.image_url.label("product_image_url"),
+        products.c.status.label("product_status"),
+        products.c.event_id,
+        or_(is_admin, is_commissioner).label("allowed")
+    ).select_from(
+        sales.join(products, products.c.id == sales.c.product_id)
+    ).where(sales.c.unique_code == unique_code)
+    if event_id is not None:
+        # Código assinado: só vale para o evento que está no QR
+        target = target.where(products.c.event_id == event_id)
+    target = target.cte("target")
+
+    updated = update(sales).where(
+        sales.c.id == target.c.id,
+        target.c.allowed,
+        sales.c.checked_at.is_(None),
+        sales.c.status == SaleStatus.PAID
+    ).values(checked_at=checked_at).returning(sales.c.id, sales.c.checked_at).cte("updated")
+
+    return select(
+        target,
+        updated.c.checked_at.label("new_checked_at")
+    ).select_from(target.outerjoin(updated, updated.c.id == target.c.id))
+
+def check_in_row_to_schema(row, checked_at: datetime) -> sale_schema.Sale:
+    return sale_schema.Sale(
+        id=row.id,
+        seller_id=row.seller_id,
+        buyer_name=row.buyer_name,
+        buyer_email=row.buyer_email,
+        sale_date=row.sale_date,
+        unique_code=row.unique_code,
+        checked_at=checked_at,
+        product=product_schema.Product(
+            id=row.product_id,
+            event_id=row.event_id,
+            name=row.product_name,
+            description=row.product_description,
+            stock=row.product_stock,
+            price=row.product_price,
+            image_url=row.product_image_url,
+            status=row.product_status
+        )
+    )
+
+def check_in_sale_by_code(db: Session, unique_code: str, current_user: user_model.User) -> sale_schema.Sale:
+    try:
+        event_id, code = parse_ticket_code(unique_code)
+    except ValueError:
+        # Rejeitado sem ir ao banco: QR forjado, corrompido ou mal lido
+        raise HTTPException(status_code=400, detail="Invalid ticket code")
+
+    if event_id is not None and event_role_from_claims(current_user, event_id) is not None:
+        checkin_index.allow(event_id, current_user.id)
+
+    # Reescaneamento: respondido pelo índice em memória, sem ir ao banco
+    if checkin_index.is_checked_in(event_id, code, current_user.id):
+        raise HTTPException(status_code=400, detail="Sale already checked in")
+
+    row = db.execute(build_check_in_statement(code, current_user.id, datetime.utcnow(), event_id)).first()
+    if row is not None:
+        record_check_ins(db, row.event_id, [row])
+    db.commit()
+
+    if row is None:
+        raise HTTPException(status_code=404, detail="Sale Not Found")
+
+    if not row.allowed:
+        raise HTTPException(status_code=403, detail="Operation not permitted: only admins and commissioners can check in sales")
+
+    checkin_index.allow(row.event_id, current_user.id)
+    if not checkin_index.is_warm(row.event_id):
+        checkin_index.warm(db, row.event_id)
+    if row.new_checked_at is not None or row.checked_at is not None:
+        checkin_index.record(row.event_id, [code])
+    if row.new_checked_at is not None:
+        door_monitor.publish(row.event_id, [{"buyer_name": row.buyer_name, "product_name": row.product_name, "checked_at": row.new_checked_at}])
+
+    if row.new_checked_at is None:
+        if row.status == SaleStatus.CANCELED:
+            raise HTTPException(status_code=400, detail="Sale is canceled and cannot be checked in")
+        # Já tinha check-in, ou outro leitor marcou no mesmo instante
+        raise HTTPException(status_code=400, detail="Sale already checked in")
+
+    return check_in_row_to_schema(row, row.new_checked_at)
+
+def build_batch_check_in_statement(event_id: int, codes: list[uuid.UUID], checked_at: datetime):
+    """Check-in de vários ingressos do mesmo evento num único statement (Postgres).
+
+    O SELECT final enxerga as vendas como estavam antes do UPDATE, então
+    `checked_at` é o valor anterior e `new_checked_at` só vem preenchido para
+    quem foi marcado agora.
+    """
+    sales = sale_model.Sale.__table__
+    products = product_model.Product.__table__
+
+    updated = update(sales).where(
+        sales.c.product_id == products.c.id,
+        products.c.event_id == event_id,
+        sales.c.unique_code.in_(codes),
+        sales.c.checked_at.is_(None),
+        sales.c.status == SaleStatus.PAID
+    ).values(checked_at=checked_at).returning(sales.c.id, sales.c.checked_at).cte("updated")
+
+    return select(
+        sales.c.unique_code,
+        sales.c.product_id,
+        sales.c.seller_id,
+        sales.c.buyer_name,
+        sales.c.status,
+        sales.c.checked_at,
+        products.c.name.label("product_name"),
+        updated.c.checked_at.label("new_checked_at")
+    ).select_from(
+        sales.join(products, products.c.id == sales.c.product_id)
+             .outerjoin(updated, updated.c.id == sales.c.id)
+    ).where(products.c.event_id == event_id, sales.c.unique_code.in_(codes))
+
+def check_in_batch(db: Session, event_id: int, unique_codes: list[str]) -> list[sale_schema.CheckInBatchItem]:
+    """Aplica os check-ins de um lote e devolve o resultado de cada código, na ordem recebida.
+
+    A autorização é responsabilidade de quem chama (uma vez por lote).
+    Código repetido no lote conta como uma entrada: as repetições voltam como already_checked_in.
+    """
+    codes = {}
+    invalid = set()
+    for unique_code in unique_codes:
+        try:
+            code_event_id, code = parse_ticket_code(unique_code)
+        except ValueError:
+            invalid.add(unique_code)
+            code = None
+        else:
+            # QR assinado de outro evento nem chega ao banco
+            if code_event_id is not None and code_event_id != event_id:
+                code = None
+        codes[unique_code] = code
+
+    valid_codes = list({code for code in codes.values() if code is not None})
+    rows = {}
+    if valid_codes:
+        rows = {row.unique_code: row for row in db.execute(build_batch_check_in_statement(event_id, valid_codes, datetime.utcnow()))}
+        record_check_ins(db, event_id, rows.values())
+        db.commit()
+
+    results = []
+    seen = set()
+    for unique_code in unique_codes:
+        code = codes[unique_code]
+        row = rows.get(code)
+        if unique_code in invalid:
+            outcome, checked_at = CheckInOutcome.INVALID, None
+        elif row is None:
+            outcome, checked_at = CheckInOutcome.UNKNOWN, None
+        elif row.new_checked_at is not None and code not in seen:
+            outcome, checked_at = CheckInOutcome.OK, row.new_checked_at
+        elif row.status == SaleStatus.CANCELED:
+            outcome, checked_at = CheckInOutcome.CANCELED, None
+        else:
+            outcome, checked_at = CheckInOutcome.ALREADY_CHECKED_IN, row.checked_at or row.new_checked_at
+        seen.add(code)
+        results.append(sale_schema.CheckInBatchItem(unique_code=unique_code, outcome=outcome, checked_at=checked_at))
+
+    if rows:
+        if not checkin_index.is_warm(event_id):
+            checkin_index.warm(db, event_id)
+        checkin_index.record(event_id, [code for code, row in rows.items() if row.new_checked_at is not None or row.checked_at is not None])
+        door_monitor.publish(event_id, [
+            {"buyer_name": row.buyer_name, "product_name": row.product_name, "checked_at": row.new_checked_at}
+            for row in rows.values() if row.new_checked_at is not None
+        ])
+
+    return results
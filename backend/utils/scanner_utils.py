@@ -0,0 +1,178 @@
+import base64
+import hashlib
+from datetime import datetime, timezone
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from enums import CheckInOutcome, SaleStatus
+from models import product_model, sale_model
+from schemas import sale_schema
+from .signature_utils import event_key, sign
+from .qrcode_utils import parse_ticket_code
+from .checkin_index_utils import checkin_index
+from .door_monitor_utils import door_monitor
+from .rollup_utils import RollupChanges
+
+MANIFEST_KEY_PURPOSE = "scanner-manifest"
+
+
+def manifest_signature_payload(event_id: int, version: str, generated_at: datetime) -> bytes:
+    return f"{event_id}:{version}:{generated_at.isoformat()}".encode()
+
+
+def build_manifest(db: Session, event_id: int) -> sale_schema.ScannerManifest:
+    """Manifesto compacto dos ingressos válidos de um evento para os leitores offline.
+
+    Os códigos vão como um conjunto binário ordenado (16 bytes por UUID, busca
+    binária no aparelho) e o estado de check-in como um bitmap alinhado. A
+    versão é o hash do conteúdo, então só muda quando uma venda/check-in muda.
+    """
+    rows = db.query(sale_model.Sale.unique_code, sale_model.Sale.checked_at)\
+        .join(sale_model.Sale.product)\
+        .filter(product_model.Product.event_id == event_id, sale_model.Sale.status == SaleStatus.PAID)\
+        .all()
+    rows.sort(key=lambda row: row.unique_code.bytes)
+
+    codes = b"".join(row.unique_code.bytes for row in rows)
+    checked = bytearray((len(rows) + 7) // 8)
+    for index, row in enumerate(rows):
+        if row.checked_at is not None:
+            checked[index // 8] |= 1 << (index % 8)
+
+    version = hashlib.sha256(codes + bytes(checked)).hexdigest()[:32]
+    generated_at = datetime.utcnow()
+    signature = sign(event_key(event_id, MANIFEST_KEY_PURPOSE), manifest_signature_payload(event_id, version, generated_at))
+
+    return sale_schema.ScannerManifest(
+        event_id=event_id,
+        version=version,
+        generated_at=generated_at,
+        count=len(rows),
+        codes=base64.b64encode(codes).decode(),
+        checked=base64.b64encode(bytes(checked)).decode(),
+        signature=signature
+    )
+
+
+def _utc_naive(value: datetime, now: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    # Relógio adiantado no aparelho: ninguém entrou depois do upload
+    return min(value, now)
+
+
+def apply_offline_check_ins(
+    db: Session,
+    event_id: int,
+    check_ins: list[sale_schema.OfflineCheckIn]
+) -> sale_schema.OfflineCheckInResult:
+    """Aplica numa transação os check-ins feitos sem rede.
+
+    Os códigos são validados como no check-in online (parse_ticket_code):
+    ilegível ou com assinatura inválida vira INVALID e QR assinado de outro
+    evento vira UNKNOWN, sem ir ao banco. Entrada dupla (no próprio lote,
+    entre aparelhos ou contra um check-in online) é resolvida pelo checked_at
+    mais antigo, independente da ordem de chegada, e devolvida em `conflicts`.
+    As vendas ficam travadas (FOR UPDATE) até o commit, então um check-in
+    online concorrente espera e vê o resultado.
+    """
+    now = datetime.utcnow()
+
+    earliest: dict = {}
+    submitted: dict = {}
+    duplicates: list[tuple] = []
+    conflicts = []
+    for item in check_ins:
+        checked_at = _utc_naive(item.checked_at, now)
+        try:
+            code_event_id, code = parse_ticket_code(item.unique_code)
+        except ValueError:
+            conflicts.append(sale_schema.OfflineCheckInConflict(unique_code=item.unique_code, reason=CheckInOutcome.INVALID, submitted_checked_at=checked_at))
+            continue
+        if code_event_id is not None and code_event_id != event_id:
+            conflicts.append(sale_schema.OfflineCheckInConflict(unique_code=item.unique_code, reason=CheckInOutcome.UNKNOWN, submitted_checked_at=checked_at))
+            continue
+
+        previous = earliest.get(code)
+        if previous is None:
+            earliest[code] = checked_at
+            submitted[code] = item.unique_code
+        else:
+            earliest[code] = min(previous, checked_at)
+            duplicates.append((item.unique_code, code, max(previous, checked_at)))
+
+    if not earliest:
+        return sale_schema.OfflineCheckInResult(applied=0, corrected=0, conflicts=conflicts)
+
+    sales = db.query(
+        sale_model.Sale.id,
+        sale_model.Sale.unique_code,
+        sale_model.Sale.product_id,
+        sale_model.Sale.seller_id,
+        sale_model.Sale.status,
+        sale_model.Sale.checked_at,
+        sale_model.Sale.buyer_name,
+        product_model.Product.name.label("product_name")
+    )\
+        .join(sale_model.Sale.product)\
+        .filter(product_model.Product.event_id == event_id, sale_model.Sale.unique_code.in_(list(earliest)))\
+        .order_by(sale_model.Sale.id)\
+        .with_for_update(of=sale_model.Sale)\
+        .all()
+    by_code = {sale.unique_code: sale for sale in sales}
+
+    updates = []
+    rollup = RollupChanges()
+    corrected = 0
+    outcome = {}
+    final_checked_at = {}
+    for code, checked_at in earliest.items():
+        sale = by_code.get(code)
+        if sale is None:
+            outcome[code] = CheckInOutcome.UNKNOWN
+        elif sale.status == SaleStatus.CANCELED:
+            outcome[code] = CheckInOutcome.CANCELED
+        elif sale.checked_at is None:
+            outcome[code] = CheckInOutcome.OK
+            final_checked_at[code] = checked_at
+            updates.append({"id": sale.id, "checked_at": checked_at})
+            rollup.add(event_id, sale.product_id, sale.seller_id, checked_at, checked_in_count=1)
+            continue
+        else:
+            outcome[code] = CheckInOutcome.ALREADY_CHECKED_IN
+            final_checked_at[code] = min(sale.checked_at, checked_at)
+            if checked_at < sale.checked_at:
+                corrected += 1
+                updates.append({"id": sale.id, "checked_at": checked_at})
+                # A entrada muda de hora no agregado
+                rollup.add(event_id, sale.product_id, sale.seller_id, sale.checked_at, checked_in_count=-1)
+                rollup.add(event_id, sale.product_id, sale.seller_id, checked_at, checked_in_count=1)
+
+        conflicts.append(sale_schema.OfflineCheckInConflict(
+            unique_code=submitted[code],
+            reason=outcome[code],
+            submitted_checked_at=checked_at,
+            checked_at=final_checked_at.get(code)
+        ))
+
+    for raw_code, code, submitted_checked_at in duplicates:
+        reason = outcome[code]
+        conflicts.append(sale_schema.OfflineCheckInConflict(
+            unique_code=raw_code,
+            reason=CheckInOutcome.ALREADY_CHECKED_IN if reason == CheckInOutcome.OK else reason,
+            submitted_checked_at=submitted_checked_at,
+            checked_at=final_checked_at.get(code)
+        ))
+
+    if updates:
+        # UPDATE em lote por chave primária
+        db.execute(update(sale_model.Sale), updates)
+    rollup.apply(db)
+    db.commit()
+
+    checkin_index.record(event_id, list(final_checked_at))
+    door_monitor.publish(event_id, [
+        {"buyer_name": by_code[code].buyer_name, "product_name": by_code[code].product_name, "checked_at": final_checked_at[code]}
+        for code, result in outcome.items() if result == CheckInOutcome.OK
+    ])
+
+    return sale_schema.OfflineCheckInResult(applied=len(updates) - corrected, corrected=corrected, conflicts=conflicts)
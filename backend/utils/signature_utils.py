@@ -0,0 +1,23 @@
+import base64
+import hashlib
+import hmac
+from config import settings
+
+
+def event_key(event_id: int, purpose: str) -> bytes:
+    """Chave HMAC própria de cada evento, derivada da SECRET_KEY (ou da SIGNING_KEY, se configurada).
+
+    Vazar a chave de um evento (ex.: a que fica nos leitores da portaria) não
+    compromete os outros eventos nem os tokens JWT.
+    """
+    master = (settings.SIGNING_KEY or settings.SECRET_KEY).encode()
+    return hmac.new(master, f"{purpose}:{event_id}".encode(), hashlib.sha256).digest()
+
+
+def sign(key: bytes, payload: bytes, length: int | None = None) -> str:
+    digest = hmac.new(key, payload, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()[:length]
+
+
+def verify(key: bytes, payload: bytes, signature: str, length: int | None = None) -> bool:
+    return hmac.compare_digest(sign(key, payload, length), signature)
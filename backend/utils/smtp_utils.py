@@ -0,0 +1,208 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from email.message import EmailMessage
+import aiosmtplib
+from config import mail_config, settings
+
+
+class RateLimiter:
+    """Token bucket assíncrono: no máximo `rate` mensagens por segundo."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SMTPSender:
+    """Envio de emails com um pool pequeno de conexões SMTP autenticadas e persistentes.
+
+    Roda num event loop próprio em uma thread dedicada, então pode ser usado
+    tanto de código síncrono (workers do outbox) quanto de rotas async.
+    Cada lote é enviado em uma única sessão SMTP, sem novo handshake TLS/login
+    por mensagem.
+    """
+
+    def __init__(self, pool_size: int, rate_limit: float):
+        self.pool_size = pool_size
+        self.rate_limit = rate_limit
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._idle: asyncio.Queue | None = None
+        self._limiter: RateLimiter | None = None
+        self._open_connections = 0
+
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._sending = 0
+        self._sent = 0
+        self._failed = 0
+        self._last_latency_ms = 0.0
+        self._avg_latency_ms = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="smtp-sender", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def stop(self, timeout: float = 10.0):
+        with self._start_lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._close_all(), self._loop).result(timeout)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._loop = None
+            self._thread = None
+
+    def submit(self, message: EmailMessage) -> Future:
+        return self.submit_batch([message])
+
+    def submit_batch(self, messages: list[EmailMessage]) -> Future:
+        """Agenda o envio de um lote; o Future resolve com uma lista de erros (None = enviado)."""
+        self.start()
+        with self._stats_lock:
+            self._queued += len(messages)
+        return asyncio.run_coroutine_threadsafe(self._send_batch(messages), self._loop)
+
+    def send(self, message: EmailMessage):
+        error = self.submit(message).result()[0]
+        if error is not None:
+            raise error
+
+    def send_batch(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        if not messages:
+            return []
+        return self.submit_batch(messages).result()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queued,
+                "sending": self._sending,
+                "sent": self._sent,
+                "failed": self._failed,
+                "open_connections": self._open_connections,
+                "pool_size": self.pool_size,
+                "rate_limit_per_second": self.rate_limit,
+                "last_send_latency_ms": round(self._last_latency_ms, 2),
+                "avg_send_latency_ms": round(self._avg_latency_ms, 2),
+            }
+
+    def _run_loop(self, ready: threading.Event):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._idle = asyncio.Queue()
+        self._limiter = RateLimiter(self.rate_limit)
+        self._open_connections = 0
+        ready.set()
+        self._loop.run_forever()
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=mail_config.MAIL_SERVER,
+            port=mail_config.MAIL_PORT,
+            use_tls=mail_config.MAIL_SSL_TLS,
+            start_tls=mail_config.MAIL_STARTTLS,
+            validate_certs=mail_config.VALIDATE_CERTS,
+            timeout=mail_config.TIMEOUT,
+        )
+
+    async def _connect(self, client: aiosmtplib.SMTP):
+        await client.connect()
+        if mail_config.USE_CREDENTIALS:
+            await client.login(mail_config.MAIL_USERNAME, mail_config.MAIL_PASSWORD.get_secret_value())
+
+    async def _acquire(self) -> aiosmtplib.SMTP:
+        if self._idle.empty() and self._open_connections < self.pool_size:
+            self._open_connections += 1
+            return self._new_client()
+        return await self._idle.get()
+
+    def _release(self, client: aiosmtplib.SMTP):
+        self._idle.put_nowait(client)
+
+    async def _send_one(self, client: aiosmtplib.SMTP, message: EmailMessage):
+        if message["From"] is None:
+            message["From"] = mail_config.MAIL_FROM
+        try:
+            if not client.is_connected:
+                await self._connect(client)
+            await client.send_message(message)
+        except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+            # Servidor derrubou a sessão ociosa: reconecta uma vez e tenta de novo
+            client.close()
+            await self._connect(client)
+            await client.send_message(message)
+
+    async def _send_batch(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        client = await self._acquire()
+        errors: list[Exception | None] = []
+        try:
+            for message in messages:
+                await self._limiter.acquire()
+                with self._stats_lock:
+                    self._queued -= 1
+                    self._sending += 1
+                started = time.perf_counter()
+                try:
+                    await self._send_one(client, message)
+                    errors.append(None)
+                    ok = True
+                except Exception as e:
+                    errors.append(e)
+                    ok = False
+                    if client.is_connected:
+                        client.close()
+                self._record(ok, (time.perf_counter() - started) * 1000)
+        finally:
+            self._release(client)
+        return errors
+
+    def _record(self, ok: bool, latency_ms: float):
+        with self._stats_lock:
+            self._sending -= 1
+            if ok:
+                self._sent += 1
+            else:
+                self._failed += 1
+            self._last_latency_ms = latency_ms
+            self._avg_latency_ms = latency_ms if self._avg_latency_ms == 0 else 0.9 * self._avg_latency_ms + 0.1 * latency_ms
+
+    async def _close_all(self):
+        while not self._idle.empty():
+            client = self._idle.get_nowait()
+            if client.is_connected:
+                try:
+                    await client.quit()
+                except Exception:
+                    client.close()
+        self._open_connections = 0
+
+
+mail_sender = SMTPSender(
+    pool_size=settings.MAIL_POOL_SIZE,
+    rate_limit=settings.MAIL_PROVIDER_RATE_LIMITS.get(settings.MAIL_SERVER, settings.MAIL_RATE_LIMIT_PER_SECOND),
+)
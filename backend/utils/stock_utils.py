@@ -0,0 +1,35 @@
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from models import product_model
+
+
+def reserve_stock(db: Session, product: product_model.Product, quantity: int = 1) -> int | None:
+    """Atomically take `quantity` units of a product's stock.
+
+    The decrement is a single conditional UPDATE, so the row lock is held only
+    until the surrounding transaction commits and two buyers can never take the
+    last unit. Products with stock NULL are unlimited and are not touched.
+    Returns the remaining stock (None for unlimited products).
+    """
+    if product.stock is None:
+        return None
+
+    remaining = db.execute(
+        update(product_model.Product)
+        .where(
+            product_model.Product.id == product.id,
+            product_model.Product.stock >= quantity
+        )
+        .values(stock=product_model.Product.stock - quantity)
+        .returning(product_model.Product.stock)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+    if remaining is None:
+        raise HTTPException(status_code=400, detail="Product Out of Stock")
+
+    # Mantém o objeto carregado na sessão coerente com o banco sem novo SELECT
+    set_committed_value(product, "stock", remaining)
+    return remaining
@@ -0,0 +1,53 @@
+import threading
+import time
+from pathlib import Path
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+# Intervalo mínimo entre dois stat() do arquivo de um template
+TEMPLATE_CHECK_INTERVAL_SECONDS = 1.0
+
+
+class TemplateCache:
+    """Templates Jinja2 compilados uma vez e recompilados só quando o mtime do arquivo muda."""
+
+    def __init__(self, directory: Path, check_interval: float = TEMPLATE_CHECK_INTERVAL_SECONDS):
+        self.directory = directory
+        self.check_interval = check_interval
+        # cache_size=0: quem guarda os templates compilados é esta classe
+        self.env = Environment(
+            loader=FileSystemLoader(str(directory)),
+            autoescape=select_autoescape(["html"]),
+            auto_reload=False,
+            cache_size=0,
+        )
+        self._templates: dict[str, tuple[Template, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def preload(self):
+        for path in self.directory.glob("*.html"):
+            self.get(path.name)
+
+    def get(self, name: str) -> Template:
+        entry = self._templates.get(name)
+        now = time.monotonic()
+        if entry is not None and now - entry[2] < self.check_interval:
+            return entry[0]
+
+        mtime = (self.directory / name).stat().st_mtime
+        with self._lock:
+            entry = self._templates.get(name)
+            if entry is not None and entry[1] == mtime:
+                template = entry[0]
+            else:
+                template = self.env.get_template(name)
+                if entry is not None:
+                    print(f"🔄 Template {name} recarregado")
+            self._templates[name] = (template, mtime, now)
+        return template
+
+    def render(self, name: str, **context) -> str:
+        return self.get(name).render(**context)
+
+
+email_templates = TemplateCache(TEMPLATES_DIR)